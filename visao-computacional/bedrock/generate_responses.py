@@ -1,16 +1,91 @@
-import boto3
+import functools
 import json
 from datetime import datetime
 import os
-from dotenv import load_dotenv  # Importa para carregar variáveis de ambiente
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 import traceback
 
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
+from utils.aws_clients import limited_client, load_env
+from utils.cache import cache_from_env, make_key
+from utils.image_preprocess import ImageSource
+from utils.jobs import QUEUED, InMemoryQueue, WorkerPool, job_store_from_env, new_job_id, queue_from_env, run_job
+from utils.pipeline import Stage, run_pipeline
+from utils.projection import face_attributes, parse_fields, project_faces
+from utils.rate_limit import emit_rate_limit_metrics, is_throttle, limited_call
+from utils.resilience import CircuitBreaker, HedgedCaller, emit_resilience_metrics
+from utils.timing import Timer, busy_response, debug_log
+from utils.warmup import check_dependencies, is_warmup_event, probe_bedrock, summarize, timed, warmup_on_init
 
-# Inicializa os clientes AWS Rekognition e Bedrock
-rekognition = boto3.client('rekognition', region_name='us-east-1')
-bedrock = boto3.client('bedrock', region_name='us-east-1')
+# Carregar variáveis de ambiente do arquivo .env (ignorado dentro do Lambda)
+load_env()
+
+# Os clientes AWS (Rekognition e Bedrock) são criados sob demanda por utils.aws_clients.limited_client
+
+# Modelo (invoke_model do bedrock-runtime, formato Anthropic Messages) e template usados para gerar as narrativas
+MODEL_ID = os.getenv('BEDROCK_MODEL_ID', 'anthropic.claude-3-haiku-20240307-v1:0')
+NARRATIVE_MAX_TOKENS = int(os.getenv('BEDROCK_MAX_TOKENS', 100))
+PROMPT_TEMPLATE = "The detected emotion is {emotion}. Can you provide a brief narrative about what this emotion might represent in the context of a pet's behavior?"
+
+# Cache das narrativas por (modelo, template, emoção), com um pool de variantes por chave
+narrative_cache = cache_from_env("NARRATIVE_CACHE", default_size=64, default_ttl=86400)
+NARRATIVE_VARIANTS = int(os.getenv('NARRATIVE_VARIANTS', 1))
+
+# Emoções retornadas pelo Rekognition, usadas para pré-carregar as narrativas no aquecimento
+EMOTIONS = ('HAPPY', 'SAD', 'ANGRY', 'CONFUSED', 'DISGUSTED', 'SURPRISED', 'CALM', 'FEAR')
+
+# Limite de chamadas simultâneas ao Bedrock por requisição e prazo total (em segundos)
+BEDROCK_MAX_WORKERS = int(os.getenv('BEDROCK_MAX_WORKERS', 4))
+BEDROCK_DEADLINE = float(os.getenv('BEDROCK_DEADLINE', 20))
+
+# Hedge no percentil BEDROCK_HEDGE_PERCENTILE das latências recentes e circuit breaker
+# que, aberto, responde na hora com uma narrativa em cache ou com o template degradado
+BEDROCK_CALL_TIMEOUT = float(os.getenv('BEDROCK_CALL_TIMEOUT', 10))
+bedrock_hedger = HedgedCaller(
+    'bedrock',
+    percentile=float(os.getenv('BEDROCK_HEDGE_PERCENTILE', 95)),
+    default_delay=float(os.getenv('BEDROCK_HEDGE_DELAY', 2)),
+    timeout=BEDROCK_CALL_TIMEOUT
+)
+bedrock_breaker = CircuitBreaker(
+    'bedrock',
+    failure_threshold=int(os.getenv('BEDROCK_BREAKER_FAILURES', 5)),
+    reset_timeout=float(os.getenv('BEDROCK_BREAKER_RESET', 30))
+)
+DEGRADED_TEMPLATE = "This pet seems to be showing {emotion}."
+
+# Modo em lote: as emoções da imagem que não estão em cache são geradas em uma única chamada
+BEDROCK_BATCH_MODE = os.getenv('BEDROCK_BATCH_MODE', 'true').lower() == 'true'
+BATCH_PROMPT_TEMPLATE = (
+    "The following emotions were detected on the faces of one image: {emotions}. "
+    "For each emotion, provide a brief narrative about what this emotion might represent in the context of a pet's behavior. "
+    "Answer only with a JSON array of objects with the keys \"index\" and \"narrative\", one object per emotion."
+)
+
+# Modelo do modo streaming (invoke_model_with_response_stream do bedrock-runtime)
+STREAM_MODEL_ID = os.getenv('BEDROCK_STREAM_MODEL_ID', MODEL_ID)
+STREAM_MAX_TOKENS = int(os.getenv('BEDROCK_STREAM_MAX_TOKENS', 100))
+
+# Campos da rota /v2/vision: padrão e aceitos no parâmetro 'fields'
+DEFAULT_FIELDS = ('emotion', 'bbox', 'narrative')
+ALLOWED_FIELDS = ('emotion', 'bbox', 'narrative')
+
+# Modo cascata: detect_labels primeiro; detect_faces só com pessoa na imagem e Bedrock só
+# com um pet na imagem ou uma face com emoção de alta confiança
+CASCADE_MODE = os.getenv('VISION_CASCADE', 'false').lower() == 'true'
+CASCADE_LABEL_CONFIDENCE = float(os.getenv('CASCADE_LABEL_CONFIDENCE', 70))
+CASCADE_EMOTION_CONFIDENCE = float(os.getenv('CASCADE_EMOTION_CONFIDENCE', 80))
+PERSON_LABELS = {'Person', 'Human', 'Face'}
+PET_LABELS = {'Pet', 'Animal', 'Dog', 'Cat', 'Puppy', 'Kitten', 'Bird', 'Mammal'}
+
+# Fila e armazenamento do modo assíncrono (memória/SQLite localmente, SQS/DynamoDB na AWS)
+job_queue = queue_from_env()
+job_store = job_store_from_env()
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+_worker_pool = None
 
 # Função para verificar as variáveis de ambiente
 def check_env_vars():
@@ -22,14 +97,112 @@ def check_env_vars():
     else:
         print("All necessary environment variables are set.")
 
+# Chama o Rekognition para detectar faces e emoções e projeta os campos pedidos
+def analisar_faces(bucket, image_name, fields, timer, source=None):
+    with timer.span("rekognition"):
+        response = limited_call(
+            'rekognition.detect_faces', limited_client('rekognition').detect_faces,
+            Image=(source or ImageSource(bucket, image_name)).rekognition_image(),
+            Attributes=face_attributes(fields)
+        )
+    return project_faces(response.get('FaceDetails', []), fields)
+
+# Chama o detect_labels e devolve os nomes dos rótulos acima da confiança mínima
+def detectar_rotulos(bucket, image_name, timer, source=None):
+    with timer.span("labels"):
+        response = limited_call(
+            'rekognition.detect_labels', limited_client('rekognition').detect_labels,
+            Image=(source or ImageSource(bucket, image_name)).rekognition_image(),
+            MaxLabels=20,
+            MinConfidence=CASCADE_LABEL_CONFIDENCE
+        )
+    return {label['Name'] for label in response.get('Labels', [])}
+
+# Análise em cascata: etapas baratas primeiro, as caras só quando necessárias
+def analisar_em_cascata(bucket, image_name, fields, timer):
+    # detect_labels e detect_faces usam a mesma imagem baixada/pré-processada
+    source = ImageSource(bucket, image_name)
+
+    def narrativas(results):
+        with timer.span("bedrock"):
+            atribuir_narrativas(results["faces"])
+        return results["faces"]
+
+    def vale_narrativa(results):
+        faces_output = results.get("faces") or []
+        return bool(faces_output) and (
+            bool(results["labels"] & PET_LABELS)
+            or any(face_data["classified_emotion_confidence"] >= CASCADE_EMOTION_CONFIDENCE for face_data in faces_output)
+        )
+
+    stages = [
+        Stage("labels", lambda results: detectar_rotulos(bucket, image_name, timer, source)),
+        Stage(
+            "faces", lambda results: analisar_faces(bucket, image_name, fields, timer, source),
+            after=("labels",),
+            when=lambda results: bool(results["labels"] & PERSON_LABELS),
+            reason="No Person/Human label in the image."
+        )
+    ]
+    if 'narrative' in fields:
+        stages.append(Stage(
+            "narrative", narrativas,
+            after=("labels", "faces"),
+            when=vale_narrativa,
+            reason="No pet label and no face with high emotion confidence."
+        ))
+
+    results, skipped = run_pipeline(stages)
+    return results.get("faces") or [], skipped
+
+# Completa o pool de narrativas de cada emoção (lendo do cache ou gerando no Bedrock o que faltar);
+# levanta RuntimeError se alguma emoção ficar sem narrativa, para o relatório marcar a etapa como degradada
+def precarregar_narrativas():
+    def variantes():
+        return sum(len(narrative_cache.get(make_key(MODEL_ID, PROMPT_TEMPLATE, emotion)) or []) for emotion in EMOTIONS)
+
+    missing = [emotion for emotion in EMOTIONS if narrativa_em_cache(emotion) is None]
+    for _ in range(NARRATIVE_VARIANTS):
+        if not missing:
+            break
+        # Uma variante por rodada, como em atribuir_narrativas: lote e, se falhar, uma chamada por emoção
+        before = variantes()
+        if not (BEDROCK_BATCH_MODE and len(missing) > 1 and gerar_narrativas_em_lote(missing) is not None):
+            gerar_narrativas(missing)
+        missing = [emotion for emotion in missing if narrativa_em_cache(emotion) is None]
+        if variantes() == before:
+            # Nenhuma variante nova (Bedrock indisponível ou circuito aberto)
+            break
+
+    loaded = len(EMOTIONS) - len(missing)
+    if missing:
+        raise RuntimeError(f"{loaded}/{len(EMOTIONS)} emotions cached; missing {', '.join(missing)}")
+    return f"{loaded}/{len(EMOTIONS)} emotions cached"
+
+# Aquece o container: clientes e conexões do S3/Rekognition/Bedrock e as narrativas em cache
+def aquecer():
+    inicio = time.perf_counter()
+    report = check_dependencies(('s3', 'rekognition', 'bedrock'), probes={'bedrock': _sonda_bedrock})
+    report["narrative_cache"] = timed(precarregar_narrativas)
+    return summarize(report, inicio)
+
+# Sonda do aquecimento com o mesmo cliente do bedrock-runtime usado nas narrativas
+def _sonda_bedrock():
+    probe_bedrock(bedrock_client())
+
 # Função principal do Lambda
 def vision(event, context):
+    if is_warmup_event(event):
+        return aquecer()
+
+    timer = Timer()
     try:
         # Verifica se as variáveis de ambiente necessárias estão definidas
         check_env_vars()
 
         # Tenta extrair e validar o corpo da requisição
-        body = json.loads(event.get('body', '{}'))
+        with timer.span("parse"):
+            body = json.loads(event.get('body', '{}'))
         bucket = body.get('bucket')
         image_name = body.get('imageName')
 
@@ -40,47 +213,50 @@ def vision(event, context):
                 "body": json.dumps({"message": "Missing 'bucket' or 'imageName' in the request body"})
             }
 
+        # Campos desejados na resposta (padrão: emoção, posição e narrativa)
+        try:
+            fields = parse_fields(body.get('fields'), DEFAULT_FIELDS, ALLOWED_FIELDS)
+        except ValueError as e:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": str(e)})
+            }
+
         # Monta a URL da imagem no S3
         image_url = f"https://{bucket}.s3.amazonaws.com/{image_name}"
-        
-        # Chama o Rekognition para detectar faces e emoções
-        response = rekognition.detect_faces(
-            Image={'S3Object': {'Bucket': bucket, 'Name': image_name}},
-            Attributes=['ALL']
-        )
 
-        faces_detected = response.get('FaceDetails', [])
+        # Chama o Rekognition e processa as faces detectadas, montando apenas os campos pedidos;
+        # no modo cascata as etapas desnecessárias são puladas (e listadas em 'skipped')
+        skipped = None
+        if CASCADE_MODE:
+            faces_output, skipped = analisar_em_cascata(bucket, image_name, fields, timer)
+        else:
+            faces_output = analisar_faces(bucket, image_name, fields, timer)
         created_time = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
 
         # Se não houver faces detectadas, retorna uma resposta apropriada
-        if not faces_detected:
+        if not faces_output:
+            response_body = {
+                "url_to_image": image_url,
+                "created_image": created_time,
+                "faces": [],
+                "message": "No faces detected."
+            }
+            if skipped is not None:
+                response_body["skipped"] = skipped
             return {
                 "statusCode": 200,
-                "body": json.dumps({
-                    "url_to_image": image_url,
-                    "created_image": created_time,
-                    "faces": [],
-                    "message": "No faces detected."
-                })
+                "body": json.dumps(response_body)
             }
 
-        # Processa as faces detectadas
-        faces_output = []
-        for face in faces_detected:
-            emotions = face.get('Emotions', [])
-            if emotions:
-                primary_emotion = max(emotions, key=lambda x: x['Confidence'])
-                face_data = {
-                    "position": face['BoundingBox'],
-                    "classified_emotion": primary_emotion['Type'],
-                    "classified_emotion_confidence": primary_emotion['Confidence']
-                }
-                faces_output.append(face_data)
-
-                # Integração com Bedrock
-                detected_emotion = primary_emotion['Type']
-                response_bedrock = visao_computacional(detected_emotion)  # Chama a função para gerar uma narrativa
-                face_data["bedrock_response"] = response_bedrock  # Adiciona a resposta do Bedrock ao output
+        # Integração com Bedrock: narrativas em cache primeiro, depois uma chamada em lote para as emoções que faltam
+        if 'narrative' in fields:
+            if not CASCADE_MODE:
+                with timer.span("bedrock"):
+                    atribuir_narrativas(faces_output)
+            for face_data in faces_output:
+                if 'emotion' not in fields:
+                    del face_data["classified_emotion"], face_data["classified_emotion_confidence"]
 
         # Monta a resposta com as emoções classificadas e narrativas geradas pelo Bedrock
         response_body = {
@@ -88,13 +264,22 @@ def vision(event, context):
             "created_image": created_time,
             "faces": faces_output
         }
+        if skipped is not None:
+            response_body["skipped"] = skipped
+
+        with timer.span("serialize"):
+            response_json = json.dumps(response_body)
 
-        # Loga o resultado no CloudWatch
-        print(json.dumps(response_body))
+        # Loga o resultado (por amostragem) e as métricas por etapa no CloudWatch
+        debug_log("Resposta:", response_json)
+        timer.emit_metrics("v2_vision")
+        emit_rate_limit_metrics()
+        emit_resilience_metrics(bedrock_breaker, bedrock_hedger)
 
         return {
             "statusCode": 200,
-            "body": json.dumps(response_body)
+            "headers": timer.headers(),
+            "body": response_json
         }
 
     except json.JSONDecodeError:
@@ -104,6 +289,9 @@ def vision(event, context):
             "body": json.dumps({"message": "Invalid JSON format."})
         }
     except Exception as e:
+        if is_throttle(e):
+            # Limite de taxa da AWS esgotado mesmo após as novas tentativas
+            return busy_response()
         # Registrar erro com mais contexto
         print(f"Erro: {e}")
         return {
@@ -111,24 +299,381 @@ def vision(event, context):
             "body": json.dumps({"message": "Internal Server Error", "error": str(e)})
         }
 
+# Adiciona a resposta do Bedrock a cada face: primeiro o cache por emoção, depois uma
+# única chamada em lote para as emoções que faltam (ou uma chamada por emoção, se o lote falhar)
+def atribuir_narrativas(faces_output):
+    emotions = list(dict.fromkeys(face_data["classified_emotion"] for face_data in faces_output))
+    narratives = {emotion: narrativa_em_cache(emotion) for emotion in emotions}
+    missing = [emotion for emotion in emotions if narratives[emotion] is None]
+    if BEDROCK_BATCH_MODE and len(missing) > 1:
+        narratives.update(gerar_narrativas_em_lote(missing) or {})
+        missing = [emotion for emotion in missing if narratives[emotion] is None]
+    if missing:
+        narratives.update(gerar_narrativas(missing))
+    for face_data in faces_output:
+        face_data["bedrock_response"] = narratives[face_data["classified_emotion"]]
+
+# Interpreta a resposta do modo em lote; retorna None se não for um array com uma narrativa por emoção
+def parse_narrativas_em_lote(text, total):
+    try:
+        items = json.loads(text[text.index('['):text.rindex(']') + 1])
+        narratives = {int(item["index"]): str(item["narrative"]) for item in items}
+    except (ValueError, TypeError, KeyError):
+        return None
+    if set(narratives) != set(range(total)):
+        return None
+    return [narratives[index] for index in range(total)]
+
+# Gera as narrativas de várias emoções com uma única chamada ao Bedrock; retorna {emoção: narrativa} ou None
+def gerar_narrativas_em_lote(emotions):
+    items = [{"index": index, "emotion": emotion} for index, emotion in enumerate(emotions)]
+    prompt = BATCH_PROMPT_TEMPLATE.format(emotions=json.dumps(items))
+
+    # Com o circuito aberto, o modo por emoção responde com as narrativas degradadas
+    if not bedrock_breaker.allow():
+        return None
+
+    try:
+        # Mesmo limite de tokens por emoção do modo individual
+        text = invocar_modelo(prompt, NARRATIVE_MAX_TOKENS * len(emotions))
+        bedrock_breaker.record_success()
+    except Exception as e:
+        bedrock_breaker.record_failure()
+        print(f"Erro na integração com o Bedrock (lote): {e}")
+        return None
+
+    narratives = parse_narrativas_em_lote(text, len(emotions))
+    if narratives is None:
+        print("Resposta do Bedrock em lote inválida; gerando narrativas por emoção.")
+        return None
+
+    # Cada narrativa entra no pool de variantes da sua emoção, como no modo por emoção
+    for emotion, narrative in zip(emotions, narratives):
+        adicionar_variante(emotion, narrative)
+    return dict(zip(emotions, narratives))
+
+# Gera as narrativas das emoções em paralelo, com limite de concorrência e prazo total
+def gerar_narrativas(emotions, max_workers=None, deadline=None):
+    max_workers = max_workers or BEDROCK_MAX_WORKERS
+    deadline = BEDROCK_DEADLINE if deadline is None else deadline
+
+    unique_emotions = list(dict.fromkeys(emotions))
+    if not unique_emotions:
+        return {}
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(unique_emotions)))
+    try:
+        futures = {emotion: executor.submit(visao_computacional, emotion) for emotion in unique_emotions}
+        done, _ = wait(futures.values(), timeout=deadline)
+
+        # Emoções que não terminaram dentro do prazo recebem a mensagem de erro padrão
+        narratives = {}
+        for emotion, future in futures.items():
+            if future in done:
+                narratives[emotion] = future.result()
+            else:
+                print(f"Prazo esgotado ao gerar narrativa para {emotion}")
+                narratives[emotion] = narrativa_degradada(emotion)
+        return narratives
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# Narrativa devolvida na hora quando o Bedrock está indisponível: uma variante em cache ou o template
+def narrativa_degradada(detected_emotion):
+    variants = narrative_cache.get(make_key(MODEL_ID, PROMPT_TEMPLATE, detected_emotion))
+    if variants:
+        return random.choice(variants)
+    return DEGRADED_TEMPLATE.format(emotion=detected_emotion.lower())
+
+# Uma das variantes já geradas para a emoção, se o pool estiver completo (senão None)
+def narrativa_em_cache(detected_emotion):
+    variants = narrative_cache.get(make_key(MODEL_ID, PROMPT_TEMPLATE, detected_emotion)) or []
+    if variants and len(variants) >= NARRATIVE_VARIANTS:
+        return random.choice(variants)
+    return None
+
+# Acrescenta uma narrativa gerada ao pool de variantes da emoção (até NARRATIVE_VARIANTS)
+def adicionar_variante(detected_emotion, text):
+    cache_key = make_key(MODEL_ID, PROMPT_TEMPLATE, detected_emotion)
+    variants = narrative_cache.get(cache_key) or []
+    if len(variants) < NARRATIVE_VARIANTS:
+        narrative_cache.set(cache_key, variants + [text])
+
+# Corpo da requisição do bedrock-runtime no formato Anthropic Messages
+def corpo_da_requisicao(prompt, max_tokens):
+    return json.dumps({
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": max_tokens,
+        "messages": [{"role": "user", "content": prompt}]
+    })
+
+# Extrai o texto da resposta do invoke_model (formatos Anthropic Messages, Titan e completion)
+def _texto_da_resposta(payload):
+    if isinstance(payload.get("content"), list):
+        return "".join(block.get("text", "") for block in payload["content"] if block.get("type") == "text")
+    if payload.get("results"):
+        return payload["results"][0].get("outputText", "")
+    return payload.get("completion", "")
+
+# Cliente do bedrock-runtime com read_timeout igual ao prazo do hedge: chamadas abandonadas
+# pelo hedge terminam junto com o prazo em vez de ocupar uma thread até o timeout padrão
+def bedrock_client():
+    return limited_client('bedrock-runtime', read_timeout=BEDROCK_CALL_TIMEOUT)
+
+# Chama o invoke_model do bedrock-runtime e devolve o texto gerado. O hedge fica dentro do
+# limitador: a espera pelo token não conta como latência da chamada
+def invocar_modelo(prompt, max_tokens):
+    def _invocar():
+        response = bedrock_client().invoke_model(
+            modelId=MODEL_ID,
+            contentType='application/json',
+            accept='application/json',
+            body=corpo_da_requisicao(prompt, max_tokens)
+        )
+        return json.loads(response['body'].read())
+
+    payload = limited_call('bedrock.invoke_model', functools.partial(bedrock_hedger.hedge, _invocar))
+    return _texto_da_resposta(payload)
+
 # Função que integra com o Bedrock para gerar narrativa baseada na emoção detectada
 def visao_computacional(detected_emotion):
+    # Reaproveita uma das variantes já geradas para esta emoção, se o pool estiver completo
+    cached = narrativa_em_cache(detected_emotion)
+    if cached is not None:
+        return cached
+
+    # Circuito aberto: não chama o Bedrock
+    if not bedrock_breaker.allow():
+        return narrativa_degradada(detected_emotion)
+
     try:
-        # Cria um prompt dinâmico com base na emoção detectada
-        prompt = f"The detected emotion is {detected_emotion}. Can you provide a brief narrative about what this emotion might represent in the context of a pet's behavior?"
-
-        # Chama o Bedrock para gerar uma resposta com base no prompt
-        response = bedrock.invoke_model(
-            modelId='gpt-3.5-turbo',  # Escolha o modelo apropriado
-            prompt=prompt,
-            max_tokens=100  # Define o número de tokens para limitar o tamanho da resposta
-        )
-        generated_text = response['text']  # Extrai o texto gerado pelo Bedrock
+        # Cria um prompt dinâmico com base na emoção detectada e chama o Bedrock
+        prompt = PROMPT_TEMPLATE.format(emotion=detected_emotion)
+        generated_text = invocar_modelo(prompt, NARRATIVE_MAX_TOKENS)
+        bedrock_breaker.record_success()
 
+        adicionar_variante(detected_emotion, generated_text)
         return generated_text
 
     except Exception as e:
+        # Falhas e timeouts contam para abrir o circuito
+        bedrock_breaker.record_failure()
         print(f"Erro na integração com o Bedrock: {e}")
-        return "Erro ao gerar narrativa usando o Bedrock."
+        return narrativa_degradada(detected_emotion)
+
+# Extrai o texto de um evento do stream (formatos Anthropic Messages, Titan e completion)
+def _texto_do_chunk(payload):
+    if payload.get("type") == "content_block_delta":
+        return payload.get("delta", {}).get("text", "")
+    return payload.get("outputText") or payload.get("completion") or ""
+
+# Gera a narrativa de uma emoção em streaming, chamando `on_delta` a cada trecho recebido
+def stream_narrativa(detected_emotion, on_delta):
+    # Com o pool de variantes completo, a narrativa em cache é enviada de uma vez
+    text = narrativa_em_cache(detected_emotion)
+    if text is not None:
+        on_delta(text)
+        return text
+
+    # Circuito aberto: envia a narrativa degradada sem chamar o Bedrock
+    if not bedrock_breaker.allow():
+        text = narrativa_degradada(detected_emotion)
+        on_delta(text)
+        return text
+
+    try:
+        generated_text = _consumir_stream(detected_emotion, on_delta)
+    except Exception:
+        bedrock_breaker.record_failure()
+        raise
+    bedrock_breaker.record_success()
+
+    # Só a narrativa completa entra no pool de variantes
+    adicionar_variante(detected_emotion, generated_text)
+    return generated_text
+
+# Fecha o stream de uma chamada que perdeu o hedge
+def _fechar_stream(response):
+    close = getattr(response['body'], 'close', None)
+    if close is not None:
+        close()
+
+# Chama o invoke_model_with_response_stream e repassa cada trecho de texto recebido. O hedge
+# cobre a abertura do stream (tempo até a primeira resposta), dentro do limitador
+def _consumir_stream(detected_emotion, on_delta):
+    prompt = PROMPT_TEMPLATE.format(emotion=detected_emotion)
+
+    def _abrir():
+        return bedrock_client().invoke_model_with_response_stream(
+            modelId=STREAM_MODEL_ID,
+            contentType='application/json',
+            accept='application/json',
+            body=corpo_da_requisicao(prompt, STREAM_MAX_TOKENS)
+        )
+
+    response = limited_call(
+        'bedrock.invoke_model_with_response_stream',
+        functools.partial(bedrock_hedger.hedge, _abrir, discard=_fechar_stream)
+    )
+
+    parts = []
+    for event in response['body']:
+        chunk = event.get('chunk')
+        if not chunk:
+            continue
+        text = _texto_do_chunk(json.loads(chunk['bytes']))
+        if text:
+            parts.append(text)
+            on_delta(text)
+    return "".join(parts)
+
+# Gera as linhas NDJSON do modo streaming: primeiro as faces, depois os trechos das narrativas
+def iter_vision_stream(bucket, image_name, fields, timer=None, deadline=None):
+    timer = timer or Timer()
+    deadline = BEDROCK_DEADLINE if deadline is None else deadline
+
+    faces_output = analisar_faces(bucket, image_name, fields, timer)
+    yield json.dumps({
+        "type": "faces",
+        "url_to_image": f"https://{bucket}.s3.amazonaws.com/{image_name}",
+        "created_image": datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
+        "faces": [
+            {key: value for key, value in face_data.items()
+             if 'emotion' in fields or key not in ("classified_emotion", "classified_emotion_confidence")}
+            for face_data in faces_output
+        ]
+    })
+
+    if faces_output and 'narrative' in fields:
+        # Faces com a mesma emoção compartilham um único stream do Bedrock
+        by_emotion = {}
+        for index, face_data in enumerate(faces_output):
+            by_emotion.setdefault(face_data["classified_emotion"], []).append(index)
+
+        events = queue.Queue()
+
+        def produzir(emotion):
+            sent = []
+
+            def on_delta(text):
+                sent.append(text)
+                events.put((emotion, text))
+
+            try:
+                stream_narrativa(emotion, on_delta)
+            except Exception as e:
+                # Como no modo sem streaming: variante em cache ou template degradado (se nada
+                # foi enviado ainda; senão o trecho já recebido fica como narrativa)
+                print(f"Erro na integração com o Bedrock (streaming): {e}")
+                if not sent:
+                    events.put((emotion, narrativa_degradada(emotion)))
+            finally:
+                events.put((emotion, None))
+
+        semaphore = threading.BoundedSemaphore(BEDROCK_MAX_WORKERS)
+
+        def produzir_limitado(emotion):
+            with semaphore:
+                produzir(emotion)
+
+        for emotion in by_emotion:
+            threading.Thread(target=produzir_limitado, args=(emotion,), daemon=True).start()
+
+        pending = set(by_emotion)
+        limit = time.monotonic() + deadline
+        with timer.span("bedrock"):
+            while pending:
+                try:
+                    emotion, text = events.get(timeout=max(0.0, limit - time.monotonic()))
+                except queue.Empty:
+                    break
+                if text is None:
+                    pending.discard(emotion)
+                    continue
+                for index in by_emotion[emotion]:
+                    yield json.dumps({"type": "narrative_delta", "face": index, "text": text})
+
+        # Emoções que não terminaram dentro do prazo recebem a narrativa degradada, como no modo sem streaming
+        for emotion in pending:
+            print(f"Prazo esgotado ao gerar narrativa para {emotion}")
+            text = narrativa_degradada(emotion)
+            for index in by_emotion[emotion]:
+                yield json.dumps({"type": "narrative_error", "face": index, "text": text})
+
+    yield json.dumps({"type": "done"})
+
+# Executa a análise de um job reaproveitando o handler síncrono
+def processar_job(request):
+    response = vision({'body': json.dumps(request)}, None)
+    body = json.loads(response['body'])
+    if response['statusCode'] != 200:
+        raise RuntimeError(body.get('message', 'Erro ao processar o job'))
+    return body
+
+# Inicia os workers locais quando a fila é em memória (na AWS quem consome é o gatilho SQS)
+def iniciar_workers_locais():
+    global _worker_pool
+    if _worker_pool is None and isinstance(job_queue, InMemoryQueue):
+        _worker_pool = WorkerPool(job_queue, job_store, processar_job, workers=JOB_WORKERS).start()
+    return _worker_pool
+
+# Cria um job de análise e retorna o id imediatamente
+def vision_job_submit(event, context):
+    try:
+        body = json.loads(event.get('body') or '{}')
+        if not body.get('bucket') or not body.get('imageName'):
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": "Missing 'bucket' or 'imageName' in the request body"})
+            }
+
+        job_id = new_job_id()
+        job_store.create(job_id, body)
+        job_queue.send({"jobId": job_id, "request": body})
+        iniciar_workers_locais()
+
+        return {
+            "statusCode": 202,
+            "body": json.dumps({
+                "jobId": job_id,
+                "status": QUEUED,
+                "statusUrl": f"/v1/vision/jobs/{job_id}"
+            })
+        }
+
+    except json.JSONDecodeError:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"message": "Invalid JSON format."})
+        }
+    except Exception as e:
+        print(f"Erro: {e}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"message": "Internal Server Error", "error": str(e)})
+        }
+
+# Consulta o status (e o resultado, quando pronto) de um job
+def vision_job_status(event, context):
+    job_id = (event.get('pathParameters') or {}).get('id')
+    job = job_store.get(job_id) if job_id else None
+    if job is None:
+        return {
+            "statusCode": 404,
+            "body": json.dumps({"message": "Job not found."})
+        }
+
+    job.pop("request", None)
+    return {
+        "statusCode": 200,
+        "body": json.dumps(job)
+    }
 
+# Worker acionado pela fila SQS: executa cada job recebido
+def vision_job_worker(event, context):
+    for record in event.get('Records', []):
+        run_job(job_store, json.loads(record['body']), processar_job)
 
+# Em concorrência provisionada (ou com WARMUP_ON_INIT=true), aquece já na inicialização do container
+if warmup_on_init():
+    print(json.dumps({"warmup": aquecer()}))
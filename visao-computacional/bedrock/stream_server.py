@@ -0,0 +1,182 @@
+"""Servidor HTTP das rotas em streaming (NDJSON enviado à medida que é gerado):
+o modo streaming da /v2/vision e o lote da /v1/vision/batch.
+
+O API Gateway REST só devolve a resposta depois que o Lambda termina, então o modo
+streaming roda atrás de uma Function URL com InvokeMode RESPONSE_STREAM. O runtime
+Python não faz streaming da resposta sozinho: o Lambda Web Adapter (layer) repassa
+cada invocação para este servidor e envia os bytes ao cliente assim que são escritos.
+
+Uso local (a partir de visao-computacional/):
+    python -m bedrock.stream_server
+    curl -N -X POST localhost:8080/v2/vision/stream -d '{"bucket": "...", "imageName": "..."}'
+    curl -N -X POST localhost:8080/v1/vision/batch -d '{"bucket": "...", "prefix": "..."}'
+"""
+import json
+import os
+import traceback
+from http import HTTPStatus
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, make_server
+
+from bedrock.generate_responses import (
+    ALLOWED_FIELDS, DEFAULT_FIELDS, aquecer, bedrock_breaker, bedrock_hedger, check_env_vars, iter_vision_stream
+)
+from lambda_function.handler import iter_vision_batch, ler_pedido_de_lote
+from utils.projection import parse_fields
+from utils.rate_limit import emit_rate_limit_metrics, is_throttle
+from utils.resilience import emit_resilience_metrics
+from utils.timing import Timer, busy_response
+from utils.warmup import is_warmup_event
+
+STREAM_PATH = '/v2/vision/stream'
+BATCH_PATH = '/v1/vision/batch'
+# Caminho em que o Lambda Web Adapter entrega eventos que não são HTTP (ex.: ping agendado)
+EVENTS_PATH = os.getenv('AWS_LWA_PASS_THROUGH_PATH', '/events')
+
+
+def _json(start_response, status, body, headers=None):
+    start_response(status, [('Content-Type', 'application/json')] + list(headers or []))
+    return [json.dumps(body).encode('utf-8')]
+
+
+def _responder(start_response, response):
+    """Envia pelo WSGI uma resposta no formato do Lambda (statusCode, headers e body)."""
+    status = HTTPStatus(response["statusCode"])
+    headers = [('Content-Type', 'application/json')] + list((response.get("headers") or {}).items())
+    start_response(f"{status.value} {status.phrase}", headers)
+    return [response["body"].encode('utf-8')]
+
+
+def _ler_corpo(environ):
+    try:
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    return environ['wsgi.input'].read(length) if length else b''
+
+
+def _linhas(lines, first, timer):
+    """Envia cada linha assim que é gerada e publica as métricas ao final do stream."""
+    try:
+        yield (first + "\n").encode('utf-8')
+        for line in lines:
+            yield (line + "\n").encode('utf-8')
+    finally:
+        timer.emit_metrics("v2_vision_stream")
+        emit_rate_limit_metrics()
+        emit_resilience_metrics(bedrock_breaker, bedrock_hedger)
+
+
+def vision_stream(environ, start_response):
+    timer = Timer()
+    try:
+        check_env_vars()
+
+        body = json.loads(_ler_corpo(environ) or b'{}')
+        bucket = body.get('bucket')
+        image_name = body.get('imageName')
+        if not bucket or not image_name:
+            return _json(start_response, '400 Bad Request',
+                         {"message": "Missing 'bucket' or 'imageName' in the request body"})
+
+        try:
+            fields = parse_fields(body.get('fields'), DEFAULT_FIELDS, ALLOWED_FIELDS)
+        except ValueError as e:
+            return _json(start_response, '400 Bad Request', {"message": str(e)})
+
+        # A primeira linha (faces) é gerada antes do status: erros do Rekognition ainda viram 503/500
+        lines = iter_vision_stream(bucket, image_name, fields, timer)
+        first = next(lines)
+
+    except json.JSONDecodeError:
+        return _json(start_response, '400 Bad Request', {"message": "Invalid JSON format."})
+    except Exception as e:
+        if is_throttle(e):
+            return _responder(start_response, busy_response())
+        print(f"Erro: {e}")
+        traceback.print_exc()
+        return _json(start_response, '500 Internal Server Error', {"message": "Internal Server Error", "error": str(e)})
+
+    start_response('200 OK', [('Content-Type', 'application/x-ndjson'), ('Cache-Control', 'no-cache')])
+    return _linhas(lines, first, timer)
+
+
+def _linhas_do_lote(lines, first):
+    """Envia cada resultado do lote assim que termina; um lote grande não fica acumulado na memória."""
+    try:
+        if first is not None:
+            yield first.encode('utf-8')
+        for line in lines:
+            yield line.encode('utf-8')
+    finally:
+        emit_rate_limit_metrics()
+
+
+def vision_batch(environ, start_response):
+    try:
+        check_env_vars()
+
+        try:
+            bucket, image_names, fields = ler_pedido_de_lote(json.loads(_ler_corpo(environ) or b'{}'))
+        except json.JSONDecodeError:
+            return _json(start_response, '400 Bad Request', {"message": "Invalid JSON in the request body"})
+        except ValueError as e:
+            return _json(start_response, '400 Bad Request', {"message": str(e)})
+
+        # O primeiro resultado é gerado antes do status: falhas ao listar o prefixo ainda viram 503/500
+        lines = iter_vision_batch(bucket, image_names, fields=fields)
+        first = next(lines, None)
+
+    except Exception as e:
+        if is_throttle(e):
+            return _responder(start_response, busy_response())
+        print(f"Erro inesperado: {e}")
+        traceback.print_exc()
+        return _json(start_response, '500 Internal Server Error', {"message": "Internal Server Error"})
+
+    start_response('200 OK', [('Content-Type', 'application/x-ndjson'), ('Cache-Control', 'no-cache')])
+    return _linhas_do_lote(lines, first)
+
+
+def app(environ, start_response):
+    path = environ.get('PATH_INFO', '')
+    method = environ.get('REQUEST_METHOD', 'GET')
+
+    if method == 'POST' and path == STREAM_PATH:
+        return vision_stream(environ, start_response)
+
+    if method == 'POST' and path == BATCH_PATH:
+        return vision_batch(environ, start_response)
+
+    if method == 'POST' and path == EVENTS_PATH:
+        # Ping de aquecimento (agendado): prepara o container e devolve o relatório
+        try:
+            event = json.loads(_ler_corpo(environ) or b'{}')
+        except json.JSONDecodeError:
+            event = None
+        if is_warmup_event(event):
+            report = aquecer()
+            print(json.dumps(report))
+            return _json(start_response, '200 OK', report)
+        return _json(start_response, '400 Bad Request', {"message": "Unsupported event."})
+
+    if method == 'GET' and path == '/':
+        # Verificação de prontidão do Lambda Web Adapter
+        return _json(start_response, '200 OK', {"status": "ok"})
+
+    return _json(start_response, '404 Not Found', {"message": "Not Found"})
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def main():
+    port = int(os.getenv('PORT', os.getenv('AWS_LWA_PORT', 8080)))
+    server = make_server('0.0.0.0', port, app, server_class=ThreadingWSGIServer)
+    print(f"Servidor de streaming ouvindo na porta {port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+
+from utils.aws_clients import reset_clients, set_client
+
+EMOTIONS = ['HAPPY', 'SAD', 'ANGRY', 'CONFUSED', 'DISGUSTED', 'SURPRISED', 'CALM', 'FEAR']
+
+
+class FakeClient:
+    """Base dos clientes falsos: simula a latência de rede e conta as chamadas."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _call(self, operation):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+
+class FakeRekognition(FakeClient):
+    """Rekognition falso que devolve `faces` faces com emoções aleatórias."""
+
+    def __init__(self, faces=1, labels=None, **kwargs):
+        super().__init__(**kwargs)
+        self.faces = faces
+        self.labels = labels or ['Person', 'Human', 'Dog']
+
+    def _face(self, index):
+        emotions = [{'Type': emotion, 'Confidence': random.uniform(0, 100)} for emotion in EMOTIONS]
+        return {
+            'BoundingBox': {'Width': 0.1, 'Height': 0.1, 'Left': 0.1 * (index % 9), 'Top': 0.1},
+            'Emotions': emotions,
+            'Confidence': 99.9
+        }
+
+    def detect_faces(self, Image, Attributes=None):
+        self._call('detect_faces')
+        return {'FaceDetails': [self._face(index) for index in range(self.faces)]}
+
+    def detect_labels(self, Image, MaxLabels=10, **kwargs):
+        self._call('detect_labels')
+        return {'Labels': [{'Name': name, 'Confidence': 99.0} for name in self.labels[:MaxLabels]]}
+
+
+class _FakePaginator:
+    def __init__(self, client, operation):
+        self.client = client
+        self.operation = operation
+
+    def paginate(self, Bucket, Prefix='', StartAfter='', **kwargs):
+        keys = sorted(key for key in self.client.keys if key.startswith(Prefix) and key > StartAfter)
+        for start in range(0, len(keys), 1000):
+            self.client._call(self.operation)
+            yield {'Contents': [{'Key': key, 'ETag': '"fake"', 'Size': 1024} for key in keys[start:start + 1000]]}
+
+
+class FakeS3(FakeClient):
+    """S3 falso com uma lista fixa de objetos."""
+
+    def __init__(self, keys=None, body=b'', **kwargs):
+        super().__init__(**kwargs)
+        self.keys = keys or []
+        self.body = body
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._call('head_object')
+        return {'ETag': f'"{abs(hash(Key))}"', 'ContentLength': len(self.body)}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._call('get_object')
+        import io
+
+        return {'Body': io.BytesIO(self.body), 'ETag': f'"{abs(hash(Key))}"'}
+
+    def get_paginator(self, operation):
+        return _FakePaginator(self, operation)
+
+
+class FakeBedrock(FakeClient):
+    """bedrock-runtime falso que devolve uma narrativa fixa (formato Anthropic Messages)."""
+
+    def invoke_model(self, body=b'{}', **kwargs):
+        self._call('invoke_model')
+        import io
+        import json
+
+        messages = json.loads(body).get('messages') or [{'content': ''}]
+        prompt = messages[0]['content']
+        text = 'Narrativa gerada pelo benchmark.'
+        if 'JSON array' in prompt:
+            # Modo em lote: responde um array com uma narrativa por item do prompt
+            items = json.loads(prompt[prompt.index('['):prompt.index(']') + 1])
+            text = json.dumps([{'index': item['index'], 'narrative': text} for item in items])
+        payload = {'content': [{'type': 'text', 'text': text}]}
+        return {'body': io.BytesIO(json.dumps(payload).encode())}
+
+    def invoke_model_with_response_stream(self, **kwargs):
+        self._call('invoke_model_with_response_stream')
+        import json
+
+        # Um evento content_block_delta por palavra, no formato do Anthropic Messages
+        return {'body': [
+            {'chunk': {'bytes': json.dumps({'type': 'content_block_delta', 'delta': {'text': word + ' '}}).encode()}}
+            for word in 'Narrativa gerada pelo benchmark.'.split()
+        ]}
+
+
+def install_fakes(faces=1, rekognition_ms=0.0, s3_ms=0.0, bedrock_ms=0.0, jitter_ms=0.0, keys=None):
+    """Registra os clientes falsos no lugar dos clientes boto3 e os devolve."""
+    reset_clients()
+    fakes = {
+        'rekognition': FakeRekognition(faces=faces, latency_ms=rekognition_ms, jitter_ms=jitter_ms),
+        's3': FakeS3(keys=keys, latency_ms=s3_ms, jitter_ms=jitter_ms),
+        'bedrock': FakeBedrock(latency_ms=bedrock_ms, jitter_ms=jitter_ms)
+    }
+    fakes['bedrock-runtime'] = fakes['bedrock']
+    for service_name, client in fakes.items():
+        set_client(service_name, client)
+    return fakes
@@ -0,0 +1,202 @@
+"""Benchmark offline dos handlers de visão, com Rekognition, S3 e Bedrock falsos.
+
+Uso (a partir de visao-computacional/):
+    python -m benchmarks.run_benchmarks --faces 5 --rekognition-ms 80 --bedrock-ms 400 --concurrency 8
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.fakes import install_fakes
+from utils.cache import LRUCache, ResultCache
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_DIR, 'benchmarks', 'results')
+
+# Handlers avaliados: nome -> (módulo, função)
+TARGETS = {
+    'v1_vision': ('lambda_function.handler', 'vision'),
+    'v2_vision': ('bedrock.generate_responses', 'vision'),
+    'rekognition_cliente': ('rekognition.rekognition_cliente', 'lambda_handler')
+}
+
+# Variáveis exigidas por check_env_vars, com valores fictícios
+FAKE_ENV = {
+    'AWS_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'benchmark',
+    'AWS_SECRET_ACCESS_KEY': 'benchmark',
+    'BUCKET_NAME': 'benchmark-bucket',
+    'CACHE_BACKEND': '',
+    'NARRATIVE_CACHE_BACKEND': '',
+    # Sem índice de resultados: o benchmark mede apenas o caminho da requisição
+    'RESULT_INDEX_BACKEND': '',
+    'DEBUG_SAMPLE_RATE': '0'
+}
+
+# Os fakes não têm cota: limites altos evitam que o token bucket (ex.: 10 TPS do Bedrock)
+# domine a vazão medida
+for _api in ('REKOGNITION_DETECT_FACES', 'REKOGNITION_DETECT_LABELS', 'BEDROCK_INVOKE_MODEL',
+             'BEDROCK_INVOKE_MODEL_WITH_RESPONSE_STREAM', 'S3_HEAD_OBJECT', 'S3_GET_OBJECT'):
+    FAKE_ENV[f'RATE_LIMIT_{_api}_TPS'] = '100000'
+    FAKE_ENV[f'RATE_LIMIT_{_api}_CONCURRENCY'] = '1024'
+
+
+def build_event(index=0):
+    body = {'bucket': FAKE_ENV['BUCKET_NAME'], 'imageName': f'benchmark-{index}.jpg'}
+    return {'body': json.dumps(body)}
+
+
+def percentiles(samples_ms):
+    ordered = sorted(samples_ms)
+
+    def _p(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {
+        'min': round(ordered[0], 3),
+        'p50': _p(0.50),
+        'p90': _p(0.90),
+        'p99': _p(0.99),
+        'max': round(ordered[-1], 3),
+        'mean': round(sum(ordered) / len(ordered), 3)
+    }
+
+
+def clear_caches(module):
+    """Limpa os caches em memória definidos no módulo do handler."""
+    for value in vars(module).values():
+        if isinstance(value, (LRUCache, ResultCache)):
+            value.clear()
+
+
+def measure_cold_import(module_name, runs):
+    """Mede o tempo de importação do módulo em processos novos."""
+    code = (
+        "import time; inicio = time.perf_counter(); "
+        f"import {module_name}; "
+        "print((time.perf_counter() - inicio) * 1000)"
+    )
+    env = {**os.environ, **FAKE_ENV}
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=PROJECT_DIR, env=env,
+            capture_output=True, text=True, check=True
+        )
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return percentiles(samples)
+
+
+def invoke(handler, index, use_cache, module):
+    if not use_cache:
+        clear_caches(module)
+    inicio = time.perf_counter()
+    response = handler(build_event(index), None)
+    elapsed = (time.perf_counter() - inicio) * 1000
+    if response.get('statusCode') != 200:
+        raise RuntimeError(f"Handler retornou {response.get('statusCode')}: {response.get('body')}")
+    return elapsed
+
+
+def benchmark_target(name, args):
+    module_name, function_name = TARGETS[name]
+    result = {'cold_import_ms': measure_cold_import(module_name, args.cold_runs)}
+
+    module = importlib.import_module(module_name)
+    handler = getattr(module, function_name)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Aquecimento: cria clientes e estruturas internas antes das medições
+        for index in range(args.warmup):
+            invoke(handler, index, args.cache, module)
+
+        latencies = [invoke(handler, index, args.cache, module) for index in range(args.iterations)]
+        result['warm_latency_ms'] = percentiles(latencies)
+
+        tracemalloc.start()
+        for index in range(args.alloc_iterations):
+            invoke(handler, index, args.cache, module)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['allocations'] = {
+            'peak_kib': round(peak / 1024, 2),
+            'retained_kib': round(current / 1024, 2),
+            'iterations': args.alloc_iterations
+        }
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            concurrent_latencies = list(executor.map(
+                lambda index: invoke(handler, index, args.cache, module), range(args.iterations)
+            ))
+        elapsed = time.perf_counter() - inicio
+        result['throughput'] = {
+            'concurrency': args.concurrency,
+            'requests': args.iterations,
+            'requests_per_second': round(args.iterations / elapsed, 2),
+            'latency_ms': percentiles(concurrent_latencies)
+        }
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', nargs='+', choices=sorted(TARGETS), default=sorted(TARGETS))
+    parser.add_argument('--faces', type=int, default=3, help='Faces devolvidas pelo Rekognition falso')
+    parser.add_argument('--rekognition-ms', type=float, default=50.0)
+    parser.add_argument('--s3-ms', type=float, default=10.0)
+    parser.add_argument('--bedrock-ms', type=float, default=200.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--alloc-iterations', type=int, default=10)
+    parser.add_argument('--cold-runs', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--cache', action='store_true', help='Mantém os caches entre invocações')
+    parser.add_argument('--output', help='Arquivo JSON de saída (padrão: benchmarks/results/<data>.json)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ.update(FAKE_ENV)
+    install_fakes(
+        faces=args.faces, rekognition_ms=args.rekognition_ms, s3_ms=args.s3_ms,
+        bedrock_ms=args.bedrock_ms, jitter_ms=args.jitter_ms
+    )
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args)
+        },
+        'results': {}
+    }
+    for name in args.targets:
+        print(f"Executando benchmark de {name}...")
+        report['results'][name] = benchmark_target(name, args)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    print(json.dumps(report['results'], indent=2))
+    print(f"Resultados salvos em {output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
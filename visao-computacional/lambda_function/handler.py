@@ -1,15 +1,70 @@
 import json
 import os
-import boto3
+import time
 from datetime import datetime
-from dotenv import load_dotenv  # Importa para carregar variáveis de ambiente
 import traceback
+from urllib.parse import unquote_plus
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
+from utils.aws_clients import get_client, limited_client, load_env
+from utils.cache import LRUCache, cache_from_env, make_key
+from utils.face_prefilter import PREFILTER_CACHE_TTL, FacePrefilter, emit_prefilter_metrics, prefilter_enabled
+from utils.image_preprocess import ImageSource
+from utils.phash import PHASH_INDEX_SIZE, PHASH_MAX_DISTANCE, BKTree, dedup_enabled, dhash
+from utils.projection import empty_face, face_attributes, parse_fields, project_faces
+from utils.result_index import index_from_env
+from utils.rate_limit import emit_rate_limit_metrics, is_throttle, limited_call
+from utils.singleflight import SingleFlight, run_with_lease
+from utils.timing import Timer, busy_response, debug_log
+from utils.warmup import check_dependencies, is_warmup_event, summarize, timed, warmup_on_init
 
-# Inicializa o cliente AWS Rekognition
-rekognition = boto3.client('rekognition', region_name='us-east-1')  
+# Carregar variáveis de ambiente do arquivo .env (ignorado dentro do Lambda)
+load_env()
+
+# Os clientes AWS (Rekognition e S3) são criados sob demanda por utils.aws_clients (limited_client nas
+# chamadas que passam pelo limitador de taxa)
+
+# Cache dos resultados do detect_faces, endereçado pelo conteúdo (bucket, chave e ETag/versão)
+faces_cache = cache_from_env("CACHE")
+
+# Cache curto de ETag/versão por objeto, evita um HEAD no S3 a cada requisição repetida
+etag_cache = LRUCache(max_size=1024, ttl=int(os.getenv("CACHE_ETAG_TTL", 60)))
+
+# Agrupa análises simultâneas da mesma imagem dentro do container
+flight = SingleFlight()
+
+# Lease no armazenamento de resultados para agrupar também entre containers (opcional)
+SINGLEFLIGHT_LEASE = os.getenv("SINGLEFLIGHT_LEASE", "false").lower() == "true"
+
+# Resultados pré-calculados no upload (RESULT_STORE_BACKEND: s3, sqlite, dynamodb ou vazio), com uma
+# camada LRU em memória na frente: repetições no mesmo container não consultam o armazenamento remoto.
+# As chaves incluem a versão do objeto, então por padrão os resultados não expiram (RESULT_STORE_TTL=0)
+result_store = cache_from_env("RESULT_STORE", default_size=1024, default_ttl=0) if os.getenv("RESULT_STORE_BACKEND") else None
+
+# Pré-filtro local de rostos: imagens claramente sem rosto não chegam ao detect_faces
+face_prefilter = FacePrefilter()
+
+# Imagens puladas pelo pré-filtro, por chave do detect_faces. O resultado vazio é só uma estimativa
+# local: fica em memória por PREFILTER_CACHE_TTL e nunca vai para o result_store nem para o índice
+prefilter_skips = LRUCache(max_size=1024, ttl=PREFILTER_CACHE_TTL)
+
+# Índice consultável (emoção, confiança, etiqueta e data) de todas as análises, compartilhado
+# entre as funções no deploy (RESULT_INDEX_BACKEND=dynamodb)
+result_index = index_from_env()
+
+# Índices de hash perceptual por bucket e conjunto de campos: imagens quase idênticas reaproveitam o resultado
+phash_indexes = {}
+
+# dHash já calculado por objeto (bucket, chave e ETag/versão): a imagem não é baixada de novo para o hash
+phash_cache = LRUCache(max_size=PHASH_INDEX_SIZE, ttl=0)
+
+# Campos da rota /v1/vision: padrão e aceitos no parâmetro 'fields'
+DEFAULT_FIELDS = ('emotion', 'bbox')
+ALLOWED_FIELDS = ('emotion', 'bbox', 'labels')
+
+# Limites da rota de lote
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", 8))
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", 500))
 
 # Função para verificar as variáveis de ambiente
 def check_env_vars():
@@ -19,8 +74,26 @@ def check_env_vars():
     if missing_vars:
         raise EnvironmentError(f"Missing environment variables: {', '.join(missing_vars)}")
 
-# Função de verificação de saúde do serviço
+# Aquece o container: clientes e conexões do S3/Rekognition e o índice local de resultados
+def aquecer():
+    inicio = time.perf_counter()
+    report = check_dependencies(('s3', 'rekognition'))
+    if result_index is not None:
+        report["result_index"] = timed(lambda: f"{len(result_index.search(since=time.time() - 86400, limit=1)[0])} row(s) read")
+    return summarize(report, inicio)
+
+# Função de verificação de saúde do serviço (?deep=true verifica cada dependência)
 def health(event, context):
+    # Ping de aquecimento (agendado): prepara o container e devolve o relatório
+    if is_warmup_event(event):
+        report = aquecer()
+        print(json.dumps(report))
+        return report
+
+    if ((event or {}).get('queryStringParameters') or {}).get('deep') == 'true':
+        report = aquecer()
+        return {"statusCode": 200 if report["status"] == "ok" else 503, "body": json.dumps(report)}
+
     body = {
         "message": "Go Serverless v3.0! Your function executed successfully!",
         "input": event,
@@ -40,15 +113,287 @@ def v2_description(event, context):
     response = {"statusCode": 200, "body": json.dumps(body)}
     return response
 
+# Obtém a identidade do conteúdo do objeto (VersionId ou ETag)
+def get_object_version(bucket, image_key):
+    key = make_key(bucket, image_key)
+    version = etag_cache.get(key)
+    if version is None:
+        head = limited_call('s3.head_object', limited_client('s3').head_object, Bucket=bucket, Key=image_key)
+        version = head.get('VersionId') or head['ETag'].strip('"')
+        etag_cache.set(key, version)
+    return version
+
+# Chaves do cache do Rekognition, endereçadas pelo conteúdo do objeto
+def faces_cache_key(bucket, image_key, attributes=('ALL',)):
+    return make_key("detect_faces", ",".join(attributes), bucket, image_key, get_object_version(bucket, image_key))
+
+def labels_cache_key(bucket, image_key):
+    return make_key("detect_labels", bucket, image_key, get_object_version(bucket, image_key))
+
+# Chama o detect_faces somente quando o resultado ainda não está em cache; retorna (faces, origem),
+# com origem "cache", "rekognition" ou "prefilter" (imagem pulada pelo pré-filtro local)
+def detect_faces_cached(bucket, image_key, attributes=('ALL',), source=None):
+    source = source or ImageSource(bucket, image_key)
+    cache_key = faces_cache_key(bucket, image_key, attributes)
+    faces_detected = faces_cache.get(cache_key)
+    if faces_detected is not None:
+        return faces_detected, "cache"
+    if prefilter_skips.get(cache_key):
+        return [], "prefilter"
+
+    # Requisições simultâneas da mesma imagem aguardam a primeira (pré-filtro e Rekognition)
+    return flight.do(cache_key, _detect_faces, source, attributes, cache_key)
+
+# Estimativa local do número de rostos (None se o pré-filtro estiver desabilitado ou falhar)
+def estimar_faces(source):
+    if not prefilter_enabled():
+        return None
+    try:
+        return face_prefilter.estimate(source.data())
+    except Exception as e:
+        if is_throttle(e):
+            raise
+        print(f"Erro no pré-filtro de rostos de {source.key}: {e}")
+        return None
+
+def _detect_faces(source, attributes, cache_key):
+    predicted = estimar_faces(source)
+    if predicted is not None and face_prefilter.should_skip(predicted):
+        prefilter_skips.set(cache_key, True)
+        return [], "prefilter"
+
+    response = limited_call(
+        'rekognition.detect_faces', limited_client('rekognition').detect_faces,
+        Image=source.rekognition_image(),  # Usa o caminho atualizado (reduzido, se habilitado)
+        Attributes=list(attributes)
+    )
+    debug_log("Resposta do Rekognition:", response)  # Para debug, por amostragem
+
+    faces_detected = response.get('FaceDetails', [])
+    faces_cache.set(cache_key, faces_detected)
+    if predicted is not None:
+        face_prefilter.record(predicted, len(faces_detected))
+    return faces_detected, "rekognition"
+
+# Chama o detect_labels somente quando o resultado ainda não está em cache; retorna (etiquetas, origem)
+def detect_labels_cached(bucket, image_key, source=None):
+    cache_key = labels_cache_key(bucket, image_key)
+    labels = faces_cache.get(cache_key)
+    if labels is not None:
+        return labels, "cache"
+    labels = limited_call(
+        'rekognition.detect_labels', limited_client('rekognition').detect_labels,
+        Image=(source or ImageSource(bucket, image_key)).rekognition_image(),
+        MaxLabels=10
+    ).get('Labels', [])
+    faces_cache.set(cache_key, labels)
+    return labels, "rekognition"
+
+# Analisa uma imagem da pasta myphotos e monta o corpo de resposta da rota /v1/vision
+def analisar_imagem(bucket, image_name, timer=None, fields=DEFAULT_FIELDS, source=None):
+    return _analisar_imagem(bucket, image_name, timer, fields, source)[0]
+
+# Mesma análise, retornando (corpo, origem): "prefilter" se as faces foram puladas pelo pré-filtro,
+# "rekognition" se alguma chamada ao Rekognition foi feita nesta requisição, "cache" se tudo veio dos caches
+def _analisar_imagem(bucket, image_name, timer=None, fields=DEFAULT_FIELDS, source=None):
+    timer = timer or Timer()
+
+    # Atualiza o image_name para incluir a pasta myphotos
+    image_key = f"myphotos/{image_name}"  # Adicionando a pasta "myphotos"
+
+    # A imagem é baixada/pré-processada uma única vez para todas as chamadas da requisição
+    source = source or ImageSource(bucket, image_key)
+
+    # Monta a URL da imagem no S3
+    image_url = f"https://{bucket}.s3.amazonaws.com/{image_key}"
+
+    want_faces = 'emotion' in fields or 'bbox' in fields
+
+    # Chama o AWS Rekognition somente para os campos pedidos (ou reaproveita o cache)
+    with timer.span("rekognition"):
+        faces_detected, faces_origem = detect_faces_cached(bucket, image_key, tuple(face_attributes(fields)), source) \
+            if want_faces else (None, "cache")
+        labels, labels_origem = detect_labels_cached(bucket, image_key, source) if 'labels' in fields else (None, "cache")
+
+    # Monta a resposta final
+    response_body = {
+        "url_to_image": image_url,
+        "created_image": datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+    }
+    if want_faces:
+        # Processar as faces detectadas; se nenhuma face for detectada, devolve uma face vazia
+        response_body["faces"] = project_faces(faces_detected, fields) if faces_detected else [empty_face(fields)]
+    if labels is not None:
+        response_body["etiquetas"] = labels
+    if faces_origem == "prefilter":
+        return response_body, "prefilter"
+    return response_body, "rekognition" if "rekognition" in (faces_origem, labels_origem) else "cache"
+
+# Chave do resultado armazenado: bucket, objeto e identidade do conteúdo
+def result_key(bucket, image_key, version=None):
+    return make_key(bucket, image_key, version or get_object_version(bucket, image_key))
+
+# Consulta o resultado pré-calculado e, se não existir, faz a análise na hora e o armazena.
+# Só análises feitas de fato (e não respostas vindas dos caches) são gravadas no índice consultável
+def analisar_imagem_armazenada(bucket, image_name, timer=None, fields=DEFAULT_FIELDS, source=None):
+    image_key = f"myphotos/{image_name}"
+
+    # Apenas a resposta padrão é pré-calculada; projeções seguem direto para a análise
+    if result_store is None or set(fields) != set(DEFAULT_FIELDS):
+        response_body, origem = _analisar_imagem(bucket, image_name, timer, fields, source)
+        if origem == "rekognition":
+            indexar_resultado(bucket, image_key, response_body, timer)
+        return response_body
+
+    timer = timer or Timer()
+    with timer.span("result_store"):
+        key = result_key(bucket, image_key)
+        response_body = result_store.get(key)
+    if response_body is not None:
+        return response_body
+
+    def _analisar_e_armazenar():
+        response_body, origem = _analisar_imagem(bucket, image_name, timer, fields, source)
+        if origem == "prefilter":
+            return response_body
+        result_store.set(key, response_body)
+        if origem == "rekognition":
+            indexar_resultado(bucket, image_key, response_body, timer)
+        return response_body
+
+    # Duplicatas simultâneas no container compartilham a mesma análise; entre containers, via lease
+    # no backend persistente (quem espera consulta o backend, não a camada em memória)
+    if SINGLEFLIGHT_LEASE:
+        return flight.do(key, run_with_lease, result_store.backend, key, _analisar_e_armazenar)
+    return flight.do(key, _analisar_e_armazenar)
+
+# Indica se a análise pode ser respondida pelos caches endereçados pelo conteúdo, sem o Rekognition
+def analise_em_cache(bucket, image_key, fields):
+    if result_store is not None and set(fields) == set(DEFAULT_FIELDS) \
+            and result_store.get(result_key(bucket, image_key)) is not None:
+        return True
+    keys = []
+    if 'emotion' in fields or 'bbox' in fields:
+        keys.append(faces_cache_key(bucket, image_key, tuple(face_attributes(fields))))
+    if 'labels' in fields:
+        keys.append(labels_cache_key(bucket, image_key))
+    return all(faces_cache.get(key) is not None or prefilter_skips.get(key) for key in keys)
+
+# Indica se as faces da imagem foram puladas pelo pré-filtro (resultado que não deve ser reaproveitado)
+def pulada_pelo_prefiltro(bucket, image_key, fields):
+    if 'emotion' not in fields and 'bbox' not in fields:
+        return False
+    return bool(prefilter_skips.get(faces_cache_key(bucket, image_key, tuple(face_attributes(fields)))))
+
+# dHash da imagem, calculado uma única vez por versão do objeto
+def hash_da_imagem(source):
+    key = make_key(source.bucket, source.key, get_object_version(source.bucket, source.key))
+    hash_value = phash_cache.get(key)
+    if hash_value is None:
+        hash_value = dhash(source.data())
+        phash_cache.set(key, hash_value)
+    return hash_value
+
+# Reaproveita o resultado de uma imagem quase idêntica já analisada (dHash a até PHASH_MAX_DISTANCE bits)
+def analisar_com_dedup(bucket, image_name, timer=None, fields=DEFAULT_FIELDS):
+    if not dedup_enabled():
+        return analisar_imagem_armazenada(bucket, image_name, timer, fields)
+
+    timer = timer or Timer()
+    image_key = f"myphotos/{image_name}"
+    image_url = f"https://{bucket}.s3.amazonaws.com/{image_key}"
+
+    # Imagens já analisadas saem do cache sem baixar a imagem para calcular o hash
+    with timer.span("cache"):
+        cached = analise_em_cache(bucket, image_key, fields)
+    if cached:
+        return analisar_imagem_armazenada(bucket, image_name, timer, fields)
+
+    # Os bytes baixados para o hash são reaproveitados pelo Rekognition e pelo pré-filtro
+    source = ImageSource(bucket, image_key)
+    try:
+        with timer.span("phash"):
+            hash_value = hash_da_imagem(source)
+    except Exception as e:
+        if is_throttle(e):
+            raise
+        print(f"Erro ao calcular o hash perceptual de {image_key}: {e}")
+        return analisar_imagem_armazenada(bucket, image_name, timer, fields, source)
+
+    # A própria imagem (já indexada em uma análise anterior) não conta como duplicata
+    index = phash_indexes.setdefault((bucket, tuple(sorted(fields))), BKTree(PHASH_INDEX_SIZE))
+    match = index.nearest(hash_value, PHASH_MAX_DISTANCE, exclude=lambda original: original["url_to_image"] == image_url)
+    if match is not None:
+        # As posições das faces são relativas ao tamanho da imagem e valem também para cópias redimensionadas
+        distance, original = match
+        return dict(
+            original,
+            url_to_image=image_url,
+            duplicate_of=original["url_to_image"],
+            match_distance=distance
+        )
+
+    response_body = analisar_imagem_armazenada(bucket, image_name, timer, fields, source)
+    if not pulada_pelo_prefiltro(bucket, image_key, fields):
+        index.add(hash_value, response_body)
+    return response_body
+
+# Grava o resultado no índice consultável; falhas no índice não afetam a resposta
+def indexar_resultado(bucket, image_key, response_body, timer=None):
+    if result_index is None or "error" in response_body:
+        return
+    try:
+        with (timer or Timer()).span("index"):
+            result_index.add(bucket, image_key, response_body)
+    except Exception as e:
+        print(f"Erro ao indexar o resultado de {image_key}: {e}")
+
+# Analisa as imagens enviadas para myphotos/ (evento ObjectCreated do S3) e armazena o resultado
+def precompute(event, context):
+    processed = []
+    for record in event.get('Records', []):
+        bucket = record['s3']['bucket']['name']
+        image_key = unquote_plus(record['s3']['object']['key'])
+        if not image_key.startswith("myphotos/"):
+            continue
+
+        # O evento já traz a identidade do conteúdo, evitando um HEAD no S3
+        s3_object = record['s3']['object']
+        version = s3_object.get('versionId') or s3_object.get('eTag')
+        if version:
+            etag_cache.set(make_key(bucket, image_key), version)
+
+        try:
+            response_body, origem = _analisar_imagem(bucket, image_key[len("myphotos/"):])
+            if origem == "prefilter":
+                # Estimativa local, não um resultado definitivo: nada é armazenado nem indexado
+                continue
+            if result_store is not None:
+                result_store.set(result_key(bucket, image_key, version), response_body)
+            indexar_resultado(bucket, image_key, response_body)
+            processed.append(image_key)
+        except Exception as e:
+            # Uma imagem com erro não impede o processamento das demais
+            print(f"Erro ao pré-calcular {image_key}: {e}")
+            traceback.print_exc()
+
+    print(json.dumps({"precomputed": processed}))
+    return {"precomputed": processed}
+
 # Função para detectar emoções nas faces usando AWS Rekognition
 def vision(event, context):
+    if is_warmup_event(event):
+        return aquecer()
+
+    timer = Timer()
     try:
         # Verifica se as variáveis de ambiente necessárias estão definidas
         check_env_vars()
 
         # Tenta extrair e validar o corpo da requisição
-        body = json.loads(event.get('body', '{}'))
-        print("Requisição recebida:", body)  # Para debug
+        with timer.span("parse"):
+            body = json.loads(event.get('body', '{}'))
+        debug_log("Requisição recebida:", body)  # Para debug, por amostragem
 
         bucket = body.get('bucket')
         image_name = body.get('imageName')
@@ -60,70 +405,31 @@ def vision(event, context):
                 "body": json.dumps({"message": "Missing 'bucket' or 'imageName' in the request body"})
             }
 
-        # Atualiza o image_name para incluir a pasta myphotos
-        image_key = f"myphotos/{image_name}"  # Adicionando a pasta "myphotos"
-
-        # Monta a URL da imagem no S3
-        image_url = f"https://{bucket}.s3.amazonaws.com/{image_key}"
-
-        # Chama o AWS Rekognition para detectar emoções nas faces
-        response = rekognition.detect_faces(
-            Image={'S3Object': {'Bucket': bucket, 'Name': image_key}},  # Usa o caminho atualizado
-            Attributes=['ALL']
-        )
-        print("Resposta do Rekognition:", response)  # Para debug
-
-        faces_detected = response.get('FaceDetails', [])
-        created_time = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
-
-        # Se nenhuma face for detectada
-        if not faces_detected:
+        # Campos desejados na resposta (padrão: emoção e posição das faces)
+        try:
+            fields = parse_fields(body.get('fields'), DEFAULT_FIELDS, ALLOWED_FIELDS)
+        except ValueError as e:
             return {
-                "statusCode": 200,
-                "body": json.dumps({
-                    "url_to_image": image_url,
-                    "created_image": created_time,
-                    "faces": [
-                        {
-                            "position": {
-                                "Height": None,
-                                "Left": None,
-                                "Top": None,
-                                "Width": None
-                            },
-                            "classified_emotion": None,
-                            "classified_emotion_confidence": None
-                        }
-                    ]
-                })
+                "statusCode": 400,
+                "body": json.dumps({"message": str(e)})
             }
 
-        # Processar as faces detectadas
-        faces_output = []
-        for face in faces_detected:
-            emotions = face.get('Emotions', [])
-            if emotions:
-                primary_emotion = max(emotions, key=lambda x: x['Confidence'])
-                face_data = {
-                    "position": face['BoundingBox'],
-                    "classified_emotion": primary_emotion['Type'],
-                    "classified_emotion_confidence": primary_emotion['Confidence']
-                }
-                faces_output.append(face_data)
+        response_body = analisar_com_dedup(bucket, image_name, timer, fields)
 
-        # Monta a resposta final
-        response_body = {
-            "url_to_image": image_url,
-            "created_image": created_time,
-            "faces": faces_output
-        }
+        with timer.span("serialize"):
+            response_json = json.dumps(response_body)
 
-        # Loga o corpo da resposta no CloudWatch
-        print(json.dumps(response_body))
+        # Loga o corpo da resposta (por amostragem) e as métricas por etapa no CloudWatch
+        debug_log("Resposta:", response_json)
+        timer.emit_metrics("vision")
+        emit_rate_limit_metrics()
+        if prefilter_enabled():
+            emit_prefilter_metrics(face_prefilter)
 
         return {
             "statusCode": 200,
-            "body": json.dumps(response_body)
+            "headers": timer.headers(),
+            "body": response_json
         }
 
     except json.JSONDecodeError:
@@ -132,9 +438,111 @@ def vision(event, context):
             "body": json.dumps({"message": "Invalid JSON in the request body"})
         }
     except Exception as e:
+        if is_throttle(e):
+            # Limite de taxa da AWS esgotado mesmo após as novas tentativas
+            return busy_response()
         print(f"Erro inesperado: {str(e)}")
         traceback.print_exc()  # Loga o traceback completo para facilitar o debug
         return {
             "statusCode": 500,
             "body": json.dumps({"message": "Internal Server Error"})
         }
+
+# Lista os nomes das imagens da pasta myphotos que começam com o prefixo informado
+def listar_imagens(bucket, prefix="", limit=None):
+    paginator = get_client('s3').get_paginator('list_objects_v2')
+    count = 0
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"myphotos/{prefix}"):
+        for obj in page.get('Contents', []):
+            if obj['Key'].endswith('/'):
+                continue
+            yield obj['Key'][len("myphotos/"):]
+            count += 1
+            if limit and count >= limit:
+                return
+
+# Analisa várias imagens em paralelo e gera uma linha NDJSON por imagem, na ordem em que terminam
+def iter_vision_batch(bucket, image_names, max_workers=None, fields=DEFAULT_FIELDS):
+    max_workers = max_workers or BATCH_MAX_WORKERS
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(analisar_com_dedup, bucket, name, None, fields): name for name in image_names}
+        for future in as_completed(futures):
+            image_name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Erros de uma imagem não interrompem o lote
+                print(f"Erro ao analisar {image_name}: {e}")
+                result = {
+                    "url_to_image": f"https://{bucket}.s3.amazonaws.com/myphotos/{image_name}",
+                    "error": str(e)
+                }
+            yield json.dumps(result) + "\n"
+    finally:
+        # Cliente desconectado: as imagens ainda não iniciadas são canceladas
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# Valida o corpo da rota de lote (lista de nomes ou prefixo); retorna (bucket, nomes, campos)
+# ou levanta ValueError com a mensagem do 400. O lote é servido em streaming por bedrock/stream_server.py
+def ler_pedido_de_lote(body):
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object")
+    bucket = body.get('bucket')
+    image_names = body.get('imageNames')
+    prefix = body.get('prefix')
+
+    if not bucket or (not image_names and prefix is None):
+        raise ValueError("Missing 'bucket' and 'imageNames' or 'prefix' in the request body")
+
+    if image_names is None:
+        image_names = listar_imagens(bucket, prefix, limit=BATCH_MAX_IMAGES)
+    elif not isinstance(image_names, list) or len(image_names) > BATCH_MAX_IMAGES:
+        raise ValueError(f"'imageNames' must be a list with at most {BATCH_MAX_IMAGES} items")
+
+    fields = parse_fields(body.get('fields'), DEFAULT_FIELDS, ALLOWED_FIELDS)
+    return bucket, image_names, fields
+
+# Converte uma data (AAAA-MM-DD ou ISO 8601) em timestamp; levanta ValueError se for inválida
+def _parse_date(value):
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}")
+
+# Consulta o índice de resultados por emoção, confiança, etiqueta e data, sem chamar a AWS
+def vision_search(event, context):
+    if result_index is None:
+        return {
+            "statusCode": 503,
+            "body": json.dumps({"message": "Result index is disabled."})
+        }
+
+    params = event.get('queryStringParameters') or {}
+    try:
+        min_confidence = params.get('minConfidence')
+        min_label_confidence = params.get('minLabelConfidence')
+        items, next_cursor = result_index.search(
+            emotion=params.get('emotion'),
+            min_confidence=float(min_confidence) if min_confidence else None,
+            label=params.get('label'),
+            min_label_confidence=float(min_label_confidence) if min_label_confidence else None,
+            since=_parse_date(params['from']) if params.get('from') else None,
+            until=_parse_date(params['to']) if params.get('to') else None,
+            limit=int(params.get('limit', 20)),
+            cursor=params.get('cursor')
+        )
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"message": str(e)})
+        }
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({"items": items, "count": len(items), "nextCursor": next_cursor})
+    }
+
+# Em concorrência provisionada (ou com WARMUP_ON_INIT=true), aquece já na inicialização do container
+if warmup_on_init():
+    print(json.dumps({"warmup": aquecer()}))
@@ -1,15 +1,51 @@
-import boto3
+import base64
+import binascii
 import json
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from dotenv import load_dotenv  
 import os
 
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
+from utils.aws_clients import get_client, limited_client, load_env
+from utils.image_preprocess import REKOGNITION_MAX_BYTES, preprocess_enabled, preprocess_image, rekognition_image
+from utils.projection import face_attributes, parse_fields, project_faces
+from utils.rate_limit import is_throttle, limited_call
+from utils.timing import busy_response
 
-# Inicializa os clientes AWS Rekognition e S3
-rekognition = boto3.client('rekognition', region_name='us-east-1')  
-s3 = boto3.client('s3')
+# Carregar variáveis de ambiente do arquivo .env (ignorado dentro do Lambda)
+load_env()
+
+# O cliente AWS Rekognition é criado sob demanda por utils.aws_clients.limited_client
+
+# Campos desta rota: padrão e aceitos no parâmetro 'fields'
+DEFAULT_FIELDS = ('emotion', 'bbox', 'labels')
+ALLOWED_FIELDS = ('emotion', 'bbox', 'labels')
+
+# Tamanho máximo do corpo de uma requisição no API Gateway
+API_PAYLOAD_MAX_BYTES = 10 * 1024 * 1024
+# Tamanho máximo da imagem enviada no corpo (binário ou imageBytes); acima disso, use a URL pré-assinada.
+# Com o pré-processamento, a original só precisa caber no corpo: o limite do Rekognition vale depois da redução
+UPLOAD_MAX_BYTES = int(os.getenv(
+    'UPLOAD_MAX_BYTES', API_PAYLOAD_MAX_BYTES if preprocess_enabled() else REKOGNITION_MAX_BYTES
+))
+# Folga para os cabeçalhos e delimitadores de um corpo multipart
+MULTIPART_OVERHEAD = 64 * 1024
+
+# URLs pré-assinadas para envio direto ao S3 (imagens grandes): prefixo, validade e tamanho máximo
+UPLOAD_PREFIX = os.getenv('UPLOAD_PREFIX', 'myphotos/uploads/')
+UPLOAD_URL_TTL = int(os.getenv('UPLOAD_URL_TTL', 300))
+UPLOAD_URL_MAX_BYTES = int(os.getenv('UPLOAD_URL_MAX_BYTES', 15 * 1024 * 1024))
+UPLOAD_CONTENT_TYPES = ('image/jpeg', 'image/png')
+
+
+class ImagemInvalida(Exception):
+    """Corpo de upload rejeitado; `status_code` é o status HTTP da resposta."""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
 
 # Função para verificar as variáveis de ambiente
 def check_env_vars():
@@ -21,20 +57,160 @@ def check_env_vars():
     else:
         print("All necessary environment variables are set.")
 
-# Função para detectar etiquetas (labels) usando bytes
-def detectar_etiquetas(imagem_bytes):
-    resposta = rekognition.detect_labels(
-        Image={'Bytes': imagem_bytes},
+# Função para detectar etiquetas (labels) na imagem (bytes ou objeto do S3)
+def detectar_etiquetas(imagem):
+    resposta = limited_call(
+        'rekognition.detect_labels', limited_client('rekognition').detect_labels,
+        Image=imagem,
         MaxLabels=10
     )
     return resposta['Labels']
 
+# Função para detectar faces e emoções na imagem (bytes ou objeto do S3)
+def detectar_faces(imagem, attributes=('ALL',)):
+    resposta = limited_call(
+        'rekognition.detect_faces', limited_client('rekognition').detect_faces,
+        Image=imagem,
+        Attributes=list(attributes)
+    )
+    return resposta.get('FaceDetails', [])
+
+# Executa a função e devolve o resultado junto com o início e o fim da chamada (em segundos)
+def _cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, inicio, time.perf_counter()
+
+# Executa detect_labels e detect_faces ao mesmo tempo sobre a mesma imagem (somente os pedidos em fields)
+def analisar_em_paralelo(imagem, fields=DEFAULT_FIELDS):
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futuros = {}
+        if 'labels' in fields:
+            futuros["detect_labels"] = executor.submit(_cronometrar, detectar_etiquetas, imagem)
+        if 'emotion' in fields or 'bbox' in fields:
+            futuros["detect_faces"] = executor.submit(_cronometrar, detectar_faces, imagem, face_attributes(fields))
+        resultados = {nome: futuro.result() for nome, futuro in futuros.items()}
+    fim = time.perf_counter()
+
+    # Tempos em milissegundos relativos ao início da análise, para evidenciar a sobreposição
+    def _ms(valor):
+        return round((valor - inicio) * 1000, 2)
+
+    timings = {
+        nome: {"start_ms": _ms(inicio_chamada), "end_ms": _ms(fim_chamada)}
+        for nome, (_, inicio_chamada, fim_chamada) in resultados.items()
+    }
+    timings["total_ms"] = _ms(fim)
+
+    etiquetas = resultados["detect_labels"][0] if "detect_labels" in resultados else None
+    faces = resultados["detect_faces"][0] if "detect_faces" in resultados else None
+    return etiquetas, faces, timings
+
+# Lê um cabeçalho da requisição sem diferenciar maiúsculas de minúsculas
+def _header(event, name):
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value or ''
+    return ''
+
+# Tipo do corpo da requisição sem os parâmetros (ex.: 'multipart/form-data')
+def _content_type(event):
+    return _header(event, 'content-type').split(';')[0].strip().lower()
+
+def corpo_binario(event):
+    return _content_type(event) in ('application/octet-stream', 'multipart/form-data') or \
+        _content_type(event).startswith('image/')
+
+# Extrai o arquivo de um corpo multipart/form-data sem copiar os bytes (parte com filename ou name="image")
+def extrair_multipart(data, content_type):
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        raise ImagemInvalida(400, "multipart/form-data body without boundary.")
+    delimiter = b'--' + match.group(1).encode('latin-1')
+    view = memoryview(data)
+
+    position = data.find(delimiter)
+    while position != -1:
+        start = position + len(delimiter)
+        if data[start:start + 2] == b'--':
+            break
+        headers_end = data.find(b'\r\n\r\n', start)
+        next_position = data.find(delimiter, headers_end) if headers_end != -1 else -1
+        if next_position == -1:
+            break
+        headers = bytes(view[start:headers_end]).decode('latin-1').lower()
+        if 'filename=' in headers or 'name="image"' in headers:
+            # O CRLF antes do próximo delimitador não faz parte do arquivo
+            return view[headers_end + 4:next_position - 2]
+        position = next_position
+    raise ImagemInvalida(400, "multipart/form-data body must contain an image file part.")
+
+# Lê a imagem de um corpo binário (octet-stream, image/* ou multipart), verificando o tamanho antes de copiar
+def ler_imagem_binaria(event):
+    content_type = _content_type(event)
+    limite = UPLOAD_MAX_BYTES + (MULTIPART_OVERHEAD if content_type == 'multipart/form-data' else 0)
+
+    content_length = _header(event, 'content-length')
+    if content_length.isdigit() and int(content_length) > limite:
+        raise ImagemInvalida(413, f"Image larger than {UPLOAD_MAX_BYTES} bytes; use a presigned upload URL.")
+
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        # O API Gateway entrega corpos binários em base64: estima o tamanho antes de decodificar
+        if len(body) // 4 * 3 > limite + 2:
+            raise ImagemInvalida(413, f"Image larger than {UPLOAD_MAX_BYTES} bytes; use a presigned upload URL.")
+        try:
+            data = base64.b64decode(body, validate=True)  # Única decodificação do corpo
+        except (binascii.Error, ValueError):
+            raise ImagemInvalida(400, "Invalid base64 encoded binary body.")
+    else:
+        data = body if isinstance(body, bytes) else body.encode('latin-1')
+
+    imagem = extrair_multipart(data, _header(event, 'content-type')) if content_type == 'multipart/form-data' else data
+    if not len(imagem):
+        raise ImagemInvalida(400, "Empty image body.")
+    if len(imagem) > UPLOAD_MAX_BYTES:
+        raise ImagemInvalida(413, f"Image larger than {UPLOAD_MAX_BYTES} bytes; use a presigned upload URL.")
+
+    # O boto3 exige bytes no parâmetro Image.Bytes: só a parte do multipart precisa ser copiada
+    if isinstance(imagem, memoryview):
+        imagem = bytes(imagem)
+    return preparar_imagem(imagem)
+
+# Pré-processa a imagem (se habilitado) e aplica o limite do Rekognition à imagem que será enviada
+def preparar_imagem(imagem):
+    if preprocess_enabled():
+        imagem = preprocess_image(imagem)
+    if len(imagem) > REKOGNITION_MAX_BYTES:
+        raise ImagemInvalida(413, f"Image larger than {REKOGNITION_MAX_BYTES} bytes; use a presigned upload URL.")
+    return imagem
+
 # Função principal do Lambda
 def lambda_handler(event, context):
     try:
         # Verifica se as variáveis de ambiente necessárias estão definidas
         check_env_vars()
 
+        # Corpo binário: a imagem vem no corpo e os campos na query string
+        if corpo_binario(event):
+            try:
+                imagem = {'Bytes': ler_imagem_binaria(event)}
+                fields = parse_fields(
+                    (event.get('queryStringParameters') or {}).get('fields'), DEFAULT_FIELDS, ALLOWED_FIELDS
+                )
+            except ImagemInvalida as e:
+                return {
+                    "statusCode": e.status_code,
+                    "body": json.dumps({"message": str(e)})
+                }
+            except ValueError as e:
+                return {
+                    "statusCode": 400,
+                    "body": json.dumps({"message": str(e)})
+                }
+            return responder_analise(imagem, None, fields)
+
         # Extrai os parâmetros do corpo da requisição
         body = json.loads(event.get('body', '{}'))
         bucket = body.get('bucket')
@@ -48,56 +224,92 @@ def lambda_handler(event, context):
                 "body": json.dumps({"message": "Bucket and imageName or imageBytes must be provided."})
             }
 
-        # Se imagem_bytes for fornecido, usa para detectar etiquetas
-        etiquetas_detectadas = []
-        if image_bytes:
-            etiquetas_detectadas = detectar_etiquetas(image_bytes.encode('utf-8'))  # Passa a imagem em bytes para detecção de etiquetas
+        # Campos desejados na resposta (padrão: emoção, posição e etiquetas)
+        try:
+            fields = parse_fields(body.get('fields'), DEFAULT_FIELDS, ALLOWED_FIELDS)
+        except ValueError as e:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": str(e)})
+            }
+
+        # imageBytes deve ser o base64 da imagem (texto); outros tipos são erro do cliente
+        if not (bucket and image_name) and not isinstance(image_bytes, str):
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": "imageBytes must be a base64 encoded image."})
+            }
 
         # Se bucket e image_name forem fornecidos, monta a URL da imagem no S3
         image_url = f"https://{bucket}.s3.amazonaws.com/{image_name}" if bucket and image_name else None
-        
-        # Chama o Rekognition para detectar faces e emoções
-        response = rekognition.detect_faces(
-            Image={'S3Object': {'Bucket': bucket, 'Name': image_name}} if bucket and image_name else {'Bytes': image_bytes},
-            Attributes=['ALL']
-        )
 
-        # Verifica se há faces detectadas
-        faces_detectadas = response.get('FaceDetails', [])
-        created_time = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+        # Monta uma única referência da imagem, compartilhada pelas duas análises
+        if bucket and image_name:
+            imagem = rekognition_image(bucket, image_name)
+        else:
+            # Verifica o tamanho pelo comprimento do base64, antes de decodificar
+            if len(image_bytes) // 4 * 3 > UPLOAD_MAX_BYTES + 2:
+                return {
+                    "statusCode": 413,
+                    "body": json.dumps({"message": f"Image larger than {UPLOAD_MAX_BYTES} bytes; use a presigned upload URL."})
+                }
+            try:
+                imagem_decodificada = base64.b64decode(image_bytes, validate=True)  # Decodifica o base64 uma única vez
+            except (binascii.Error, ValueError):
+                return {
+                    "statusCode": 400,
+                    "body": json.dumps({"message": "imageBytes must be a base64 encoded image."})
+                }
+            try:
+                imagem = {'Bytes': preparar_imagem(imagem_decodificada)}
+            except ImagemInvalida as e:
+                return {
+                    "statusCode": e.status_code,
+                    "body": json.dumps({"message": str(e)})
+                }
 
-        # Se não houver faces detectadas, retorna uma resposta apropriada
-        if not faces_detectadas:
-            return {
-                "statusCode": 200,
-                "body": json.dumps({
-                    "url_to_image": image_url,
-                    "created_image": created_time,
-                    "faces": [],
-                    "etiquetas": etiquetas_detectadas if etiquetas_detectadas else "Nenhuma etiqueta detectada."
-                })
-            }
+        return responder_analise(imagem, image_url, fields)
 
-        # Processa as faces detectadas
-        faces_output = []
-        for face in faces_detectadas:
-            emotions = face.get('Emotions', [])
-            if emotions:
-                primary_emotion = max(emotions, key=lambda x: x['Confidence'])
-                face_data = {
-                    "position": face['BoundingBox'],
-                    "classified_emotion": primary_emotion['Type'],
-                    "classified_emotion_confidence": primary_emotion['Confidence']
-                }
-                faces_output.append(face_data)
+    except json.JSONDecodeError:
+        # Captura erro de decodificação JSON
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"message": "Invalid JSON format."})
+        }
+    except EnvironmentError as e:
+        # Captura erro relacionado a variáveis de ambiente
+        print(f"Environment Error: {str(e)}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"message": str(e)})
+        }
+    except Exception as e:
+        if is_throttle(e):
+            # Limite de taxa da AWS esgotado mesmo após as novas tentativas
+            return busy_response()
+        print(f"Erro: {e}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"message": "Internal Server Error", "error": str(e)})
+        }
 
-        # Monta a resposta com as emoções e etiquetas classificadas
+# Analisa a imagem e monta a resposta do lambda_handler
+def responder_analise(imagem, image_url, fields):
+    try:
+        # Chama o Rekognition para detectar etiquetas, faces e emoções em paralelo
+        etiquetas_detectadas, faces_detectadas, timings = analisar_em_paralelo(imagem, fields)
+        created_time = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+
+        # Monta a resposta com as emoções e etiquetas classificadas (somente os campos pedidos)
         response_body = {
             "url_to_image": image_url,
-            "created_image": created_time,
-            "faces": faces_output,
-            "etiquetas": etiquetas_detectadas if etiquetas_detectadas else "Nenhuma etiqueta detectada."
+            "created_image": created_time
         }
+        if faces_detectadas is not None:
+            response_body["faces"] = project_faces(faces_detectadas, fields)
+        if etiquetas_detectadas is not None:
+            response_body["etiquetas"] = etiquetas_detectadas if etiquetas_detectadas else "Nenhuma etiqueta detectada."
+        response_body["timings"] = timings
 
         # Loga o resultado no CloudWatch
         print(json.dumps(response_body))
@@ -107,24 +319,72 @@ def lambda_handler(event, context):
             "body": json.dumps(response_body)
         }
 
+    except Exception as e:
+        if is_throttle(e):
+            # Limite de taxa da AWS esgotado mesmo após as novas tentativas
+            return busy_response()
+        # Registrar erro com mais contexto
+        print(f"Erro: {e}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"message": "Internal Server Error", "error": str(e)})
+        }
+
+# Gera uma URL pré-assinada de PUT no S3: a imagem vai direto para o bucket e a API recebe só a chave
+def gerar_url_upload(event, context):
+    try:
+        check_env_vars()
+
+        body = json.loads(event.get('body') or '{}')
+        content_type = body.get('contentType', 'image/jpeg')
+        if content_type not in UPLOAD_CONTENT_TYPES:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": f"contentType must be one of: {', '.join(UPLOAD_CONTENT_TYPES)}"})
+            }
+
+        # Com o tamanho informado, o Content-Length entra na assinatura e o S3 recusa arquivos diferentes
+        params = {'Bucket': os.getenv('BUCKET_NAME'), 'ContentType': content_type}
+        size = body.get('contentLength')
+        if size is not None:
+            if not isinstance(size, int) or not 0 < size <= UPLOAD_URL_MAX_BYTES:
+                return {
+                    "statusCode": 400,
+                    "body": json.dumps({"message": f"contentLength must be between 1 and {UPLOAD_URL_MAX_BYTES} bytes."})
+                }
+            params['ContentLength'] = size
+
+        # Nome gerado no servidor; a extensão segue o tipo do conteúdo
+        extensao = '.png' if content_type == 'image/png' else '.jpg'
+        params['Key'] = f"{UPLOAD_PREFIX}{uuid.uuid4().hex}{extensao}"
+
+        upload_url = get_client('s3').generate_presigned_url(
+            'put_object', Params=params, ExpiresIn=UPLOAD_URL_TTL
+        )
+
+        return {
+            "statusCode": 200,
+            "body": json.dumps({
+                "uploadUrl": upload_url,
+                "method": "PUT",
+                "headers": {"Content-Type": content_type},
+                "bucket": params['Bucket'],
+                # 'key' é a chave completa (rotas /v1/rekognition e /v2/vision); 'imageName' é relativo
+                # a myphotos/, como a rota /v1/vision espera (ela acrescenta o prefixo)
+                "key": params['Key'],
+                "imageName": params['Key'][len("myphotos/"):] if params['Key'].startswith("myphotos/") else params['Key'],
+                "expiresIn": UPLOAD_URL_TTL
+            })
+        }
+
     except json.JSONDecodeError:
-        # Captura erro de decodificação JSON
         return {
             "statusCode": 400,
             "body": json.dumps({"message": "Invalid JSON format."})
         }
-    except EnvironmentError as e:
-        # Captura erro relacionado a variáveis de ambiente
-        print(f"Environment Error: {str(e)}")
-        return {
-            "statusCode": 500,
-            "body": json.dumps({"message": str(e)})
-        }
     except Exception as e:
-        # Registrar erro com mais contexto
         print(f"Erro: {e}")
         return {
             "statusCode": 500,
             "body": json.dumps({"message": "Internal Server Error", "error": str(e)})
         }
-
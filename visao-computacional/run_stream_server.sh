@@ -0,0 +1,4 @@
+#!/bin/sh
+# Handler do visionStream: o Lambda Web Adapter (AWS_LAMBDA_EXEC_WRAPPER=/opt/bootstrap) executa
+# este script e encaminha as invocações da Function URL para o servidor HTTP
+exec python3 -m bedrock.stream_server
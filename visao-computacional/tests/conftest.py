@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Adiciona o diretório visao-computacional ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
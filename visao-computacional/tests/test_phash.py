@@ -0,0 +1,116 @@
+import io
+import random
+
+import pytest
+
+from utils import phash
+from utils.phash import BKTree, hamming
+
+
+def _random_hashes(count, seed=42):
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(count)]
+
+
+def _flip_bits(value, bits, rng):
+    for bit in rng.sample(range(64), bits):
+        value ^= 1 << bit
+    return value
+
+
+def test_nearest_matches_brute_force():
+    hashes = _random_hashes(500)
+    tree = BKTree()
+    for index, hash_value in enumerate(hashes):
+        tree.add(hash_value, index)
+
+    rng = random.Random(7)
+    for _ in range(200):
+        query = _flip_bits(rng.choice(hashes), rng.randint(0, 8), rng)
+        expected = min(hamming(query, hash_value) for hash_value in hashes)
+        match = tree.nearest(query, max_distance=6)
+        if expected > 6:
+            assert match is None
+        else:
+            distance, index = match
+            assert distance == expected == hamming(query, hashes[index])
+
+
+def test_nearest_prunes_distant_subtrees(monkeypatch):
+    hashes = _random_hashes(2000)
+    tree = BKTree()
+    for index, hash_value in enumerate(hashes):
+        tree.add(hash_value, index)
+
+    visited = []
+
+    def counting_hamming(a, b):
+        visited.append(b)
+        return bin(a ^ b).count('1')
+
+    monkeypatch.setattr(phash, 'hamming', counting_hamming)
+    query = _flip_bits(hashes[1234], 3, random.Random(1))
+    assert tree.nearest(query, max_distance=4) == (3, 1234)
+    # Pela desigualdade triangular, a busca não compara com a maioria dos nós
+    assert len(visited) < len(hashes) / 2
+
+
+def test_nearest_respects_max_distance_and_exclude():
+    tree = BKTree()
+    tree.add(0b0000, "a")
+    tree.add(0b0111, "b")
+    assert tree.nearest(0b1111, max_distance=0) is None
+    assert tree.nearest(0b0000, max_distance=0) == (0, "a")
+    assert tree.nearest(0b0000, max_distance=3, exclude=lambda value: value == "a") == (3, "b")
+
+
+def test_add_same_hash_keeps_latest_value_and_resets_when_full():
+    tree = BKTree(max_size=2)
+    tree.add(1, "old")
+    tree.add(1, "new")
+    assert len(tree) == 1
+    assert tree.nearest(1, max_distance=0) == (0, "new")
+
+    tree.add(2, "b")
+    tree.add(3, "c")
+    assert len(tree) == 1
+    assert tree.nearest(1, max_distance=0) is None
+
+
+@pytest.fixture
+def pil_image(monkeypatch):
+    image_module = pytest.importorskip("PIL.Image")
+    monkeypatch.setattr(phash, 'Image', image_module)
+    return image_module
+
+
+def _jpeg(image):
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+def _noise_image(image_module, seed, size=(256, 192)):
+    rng = random.Random(seed)
+    small = image_module.new('L', (16, 12))
+    small.putdata([rng.randrange(256) for _ in range(16 * 12)])
+    return small.resize(size, image_module.BILINEAR).convert('RGB')
+
+
+def test_dhash_is_stable_for_the_same_bytes(pil_image):
+    data = _jpeg(_noise_image(pil_image, seed=1))
+    assert phash.dhash(data) == phash.dhash(data)
+    assert 0 <= phash.dhash(data) < 2 ** 64
+
+
+def test_dhash_of_resized_copy_is_close(pil_image):
+    original = _noise_image(pil_image, seed=1)
+    resized = original.resize((128, 96), pil_image.BILINEAR)
+    distance = hamming(phash.dhash(_jpeg(original)), phash.dhash(_jpeg(resized)))
+    assert distance <= phash.PHASH_MAX_DISTANCE
+
+
+def test_dhash_of_different_images_is_far(pil_image):
+    first = phash.dhash(_jpeg(_noise_image(pil_image, seed=1)))
+    second = phash.dhash(_jpeg(_noise_image(pil_image, seed=2)))
+    assert hamming(first, second) > phash.PHASH_MAX_DISTANCE
@@ -0,0 +1,95 @@
+import os
+import threading
+
+# Clientes já criados, reaproveitados entre invocações "quentes" do Lambda
+_clients = {}
+# Clientes registrados por set_client: valem para qualquer configuração do serviço
+_fixed_clients = {}
+_lock = threading.Lock()
+
+
+def running_in_lambda():
+    """Indica se o código está executando dentro do AWS Lambda."""
+    return bool(os.getenv('AWS_LAMBDA_FUNCTION_NAME'))
+
+
+def load_env():
+    """Carrega o .env somente fora do Lambda (lá as variáveis já vêm da configuração da função)."""
+    if running_in_lambda():
+        return
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
+def client_config(**overrides):
+    """Configuração de conexão compartilhada pelos clientes, ajustável por variáveis de ambiente.
+
+    `overrides` substitui opções do botocore.config.Config (ex.: retries, read_timeout).
+    """
+    from botocore.config import Config
+
+    options = {
+        'max_pool_connections': int(os.getenv('BOTO_MAX_POOL_CONNECTIONS', 50)),
+        'tcp_keepalive': os.getenv('BOTO_TCP_KEEPALIVE', 'true').lower() == 'true',
+        'connect_timeout': float(os.getenv('BOTO_CONNECT_TIMEOUT', 2)),
+        'read_timeout': float(os.getenv('BOTO_READ_TIMEOUT', 20)),
+        'retries': {
+            'mode': os.getenv('BOTO_RETRY_MODE', 'adaptive'),
+            'max_attempts': int(os.getenv('BOTO_MAX_ATTEMPTS', 3))
+        }
+    }
+    options.update(overrides)
+    return Config(**options)
+
+
+def get_client(service_name, region_name=None, **overrides):
+    """Retorna o cliente boto3 do serviço, criando-o apenas no primeiro uso.
+
+    Cada combinação de `overrides` da configuração tem o seu próprio cliente (e pool de conexões).
+    """
+    region_name = region_name or os.getenv('AWS_REGION', 'us-east-1')
+    fixed = _fixed_clients.get((service_name, region_name))
+    if fixed is not None:
+        return fixed
+
+    key = (service_name, region_name, repr(sorted(overrides.items())))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            import boto3
+
+            client = boto3.client(service_name, region_name=region_name, config=client_config(**overrides))
+            _clients[key] = client
+    return client
+
+
+def limited_client(service_name, region_name=None, **overrides):
+    """Cliente para chamadas feitas via utils.rate_limit.limited_call.
+
+    O limitador já refaz as chamadas com backoff e ajusta a concorrência a cada
+    throttling; com as novas tentativas do botocore por baixo, uma chamada viraria
+    até (tentativas do limitador x tentativas do botocore) requisições. Por isso
+    esses clientes fazem uma única tentativa.
+    """
+    return get_client(service_name, region_name, retries={'mode': 'standard', 'max_attempts': 1}, **overrides)
+
+
+def set_client(service_name, client, region_name=None):
+    """Registra um cliente já pronto para o serviço (ex.: fakes em benchmarks)."""
+    region_name = region_name or os.getenv('AWS_REGION', 'us-east-1')
+    with _lock:
+        _fixed_clients[(service_name, region_name)] = client
+
+
+def reset_clients():
+    """Descarta os clientes criados (útil para testes e benchmarks)."""
+    with _lock:
+        _clients.clear()
+        _fixed_clients.clear()
@@ -0,0 +1,169 @@
+"""Reanálise em massa de um prefixo do bucket, com retomada a partir de checkpoint.
+
+Uso:
+    python utils/bulk_analyze.py <bucket> --prefix 2026/ --workers 8 --tps 5 --output-dir bulk-results
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Adiciona o caminho do diretório pai ao sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))  # Diretório atual (utils)
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))  # Diretório pai (visao-computacional)
+sys.path.append(parent_dir)
+
+from lambda_function.handler import analisar_imagem  # noqa: E402
+from utils.aws_clients import get_client  # noqa: E402
+from utils.rate_limit import TokenBucket  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Resultados concluídos fora de ordem retidos no máximo (em múltiplos de workers) enquanto a
+# chave mais antiga ainda não terminou
+MAX_LOOKAHEAD = 4
+
+
+def iter_image_keys(bucket, prefix, start_after=None):
+    """Percorre o list_objects_v2 página a página, gerando as chaves das imagens."""
+    params = {'Bucket': bucket, 'Prefix': prefix}
+    if start_after:
+        params['StartAfter'] = start_after
+    for page in get_client('s3').get_paginator('list_objects_v2').paginate(**params):
+        for obj in page.get('Contents', []):
+            if obj['Key'].lower().endswith(IMAGE_EXTENSIONS):
+                yield obj['Key']
+
+
+class ResultWriter:
+    """Grava os resultados em blocos JSONL (e Parquet opcional) e mantém o checkpoint."""
+
+    def __init__(self, output_dir, chunk_size=1000, parquet=False):
+        self.output_dir = output_dir
+        self.chunk_size = chunk_size
+        self.parquet = parquet
+        self.checkpoint_path = os.path.join(output_dir, 'checkpoint.json')
+        self.buffer = []
+        os.makedirs(output_dir, exist_ok=True)
+        self.checkpoint = self.load_checkpoint()
+
+    def load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as file:
+                return json.load(file)
+        return {"last_key": None, "chunks": 0, "processed": 0, "errors": 0}
+
+    def add(self, key, result):
+        self.buffer.append(result)
+        self.checkpoint["last_key"] = key
+        if "error" in result:
+            self.checkpoint["errors"] += 1
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        chunk_name = f"results-{self.checkpoint['chunks'] + 1:05d}"
+        with open(os.path.join(self.output_dir, f"{chunk_name}.jsonl"), 'w') as file:
+            for result in self.buffer:
+                file.write(json.dumps(result) + "\n")
+        if self.parquet:
+            self.write_parquet(chunk_name)
+
+        self.checkpoint["chunks"] += 1
+        self.checkpoint["processed"] += len(self.buffer)
+        self.buffer = []
+
+        # Grava o checkpoint de forma atômica, somente depois que o bloco está em disco
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.checkpoint, file)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def write_parquet(self, chunk_name):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("pyarrow não está instalado; gravando apenas JSONL.")
+            self.parquet = False
+            return
+        rows = [{"key": result.get("key"), "data": json.dumps(result)} for result in self.buffer]
+        pq.write_table(pa.Table.from_pylist(rows), os.path.join(self.output_dir, f"{chunk_name}.parquet"))
+
+
+def analisar_chave(bucket, key, limiter):
+    limiter.acquire()
+    try:
+        result = analisar_imagem(bucket, key[len("myphotos/"):])
+    except Exception as e:
+        result = {"url_to_image": f"https://{bucket}.s3.amazonaws.com/{key}", "error": str(e)}
+    result["key"] = key
+    return result
+
+
+def run(bucket, prefix="", workers=8, tps=5.0, output_dir="bulk-results", chunk_size=1000, parquet=False):
+    writer = ResultWriter(output_dir, chunk_size, parquet)
+    start_after = writer.checkpoint["last_key"]
+    if start_after:
+        print(f"Retomando após {start_after} ({writer.checkpoint['processed']} imagens já processadas).")
+
+    limiter = TokenBucket(tps)
+    keys = iter_image_keys(bucket, f"myphotos/{prefix}", start_after)
+
+    # Chaves em andamento na ordem da listagem: o checkpoint só avança sobre um prefixo contínuo concluído
+    pending = deque()
+    done = {}
+    inicio = time.time()
+    total = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        exhausted = False
+        while not exhausted or in_flight:
+            # Mantém no máximo 2x workers chamadas enfileiradas, sem listar o prefixo inteiro de uma vez;
+            # se a chave mais antiga demorar, para de submeter até o checkpoint voltar a avançar
+            while not exhausted and len(in_flight) < workers * 2 and len(done) < workers * MAX_LOOKAHEAD:
+                key = next(keys, None)
+                if key is None:
+                    exhausted = True
+                    break
+                in_flight[executor.submit(analisar_chave, bucket, key, limiter)] = key
+                pending.append(key)
+
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done[in_flight.pop(future)] = future.result()
+
+            while pending and pending[0] in done:
+                key = pending.popleft()
+                writer.add(key, done.pop(key))
+                total += 1
+                if total % 100 == 0:
+                    print(f"{total} imagens processadas ({total / (time.time() - inicio):.1f} img/s)")
+
+    writer.flush()
+    print(f"Concluído: {total} imagens nesta execução, {writer.checkpoint['errors']} erros no total.")
+    return writer.checkpoint
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reanálise em massa de um prefixo da pasta myphotos.")
+    parser.add_argument('bucket')
+    parser.add_argument('--prefix', default='', help='Prefixo dentro de myphotos/ (ex.: 2026/)')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--tps', type=float, default=5.0, help='Limite de chamadas por segundo ao Rekognition')
+    parser.add_argument('--output-dir', default='bulk-results')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--parquet', action='store_true', help='Também grava cada bloco em Parquet (requer pyarrow)')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run(args.bucket, args.prefix, args.workers, args.tps, args.output_dir, args.chunk_size, args.parquet)
@@ -0,0 +1,263 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Cache em memória com despejo por tamanho (LRU) e por TTL."""
+
+    def __init__(self, max_size=256, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna o valor armazenado ou None se ausente/expirado."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Armazena o valor, removendo o item menos usado se o cache estiver cheio."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """Camada persistente local em um arquivo SQLite."""
+
+    def __init__(self, path="cache.sqlite3", table="cache"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._conn.commit()
+
+    def acquire_lease(self, key, ttl):
+        """Obtém um lease exclusivo (válido também entre processos que usam o mesmo arquivo)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT expires_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[0] is not None and row[0] > now:
+                    return False
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, "null", now + ttl),
+                )
+                return True
+            finally:
+                self._conn.commit()
+
+    def release_lease(self, key):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+
+class DynamoDBBackend:
+    """Camada persistente em uma tabela chave-valor do DynamoDB (chave de partição 'key')."""
+
+    def __init__(self, table_name, client=None):
+        self.table_name = table_name
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from utils.aws_clients import get_client
+
+            self._client = get_client('dynamodb')
+        return self._client
+
+    def get(self, key):
+        item = self.client.get_item(
+            TableName=self.table_name, Key={'key': {'S': key}}
+        ).get('Item')
+        if not item:
+            return None
+        expires_at = item.get('expires_at', {}).get('N')
+        if expires_at is not None and float(expires_at) < time.time():
+            return None
+        return json.loads(item['value']['S'])
+
+    def set(self, key, value, ttl=None):
+        item = {'key': {'S': key}, 'value': {'S': json.dumps(value)}}
+        if ttl:
+            # Também serve como atributo de TTL nativo do DynamoDB
+            item['expires_at'] = {'N': str(int(time.time() + ttl))}
+        self.client.put_item(TableName=self.table_name, Item=item)
+
+    def acquire_lease(self, key, ttl):
+        """Obtém um lease exclusivo com escrita condicional."""
+        now = time.time()
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={'key': {'S': key}, 'value': {'S': 'null'}, 'expires_at': {'N': str(now + ttl)}},
+                ConditionExpression='attribute_not_exists(#k) OR expires_at < :now',
+                ExpressionAttributeNames={'#k': 'key'},
+                ExpressionAttributeValues={':now': {'N': str(now)}}
+            )
+            return True
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def release_lease(self, key):
+        self.client.delete_item(TableName=self.table_name, Key={'key': {'S': key}})
+
+
+class S3Backend:
+    """Camada persistente em objetos JSON de um bucket S3, sob um prefixo próprio."""
+
+    def __init__(self, bucket, prefix="results/", client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from utils.aws_clients import get_client
+
+            self._client = get_client('s3')
+        return self._client
+
+    def object_key(self, key):
+        return f"{self.prefix}{key.replace('|', '/')}.json"
+
+    def get(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        expires_at = response.get('Metadata', {}).get('expires-at')
+        if expires_at is not None and float(expires_at) < time.time():
+            return None
+        return json.loads(response['Body'].read())
+
+    def set(self, key, value, ttl=None):
+        metadata = {'expires-at': str(int(time.time() + ttl))} if ttl else {}
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.object_key(key),
+            Body=json.dumps(value).encode('utf-8'),
+            ContentType='application/json',
+            Metadata=metadata
+        )
+
+
+class ResultCache:
+    """Cache em duas camadas: memória (LRU) e um backend persistente opcional."""
+
+    def __init__(self, memory=None, backend=None, ttl=3600):
+        self.ttl = ttl
+        self.memory = memory or LRUCache(ttl=ttl)
+        self.backend = backend
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or self.backend is None:
+            return value
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"Erro ao consultar o cache persistente: {e}")
+            return None
+        if value is not None:
+            # Promove o item para a camada em memória
+            self.memory.set(key, value)
+        return value
+
+    def clear(self):
+        """Limpa apenas a camada em memória."""
+        self.memory.clear()
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, ttl=self.ttl)
+            except Exception as e:
+                print(f"Erro ao gravar no cache persistente: {e}")
+
+
+def make_key(*parts):
+    """Monta uma chave de cache a partir das partes informadas."""
+    return "|".join("" if part is None else str(part) for part in parts)
+
+
+def backend_from_env(prefix="CACHE"):
+    """Cria o backend persistente a partir das variáveis de ambiente.
+
+    <PREFIX>_BACKEND aceita 'sqlite', 'dynamodb', 's3' ou vazio (somente memória).
+    """
+    kind = os.getenv(f"{prefix}_BACKEND", "").lower()
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv(f"{prefix}_SQLITE_PATH", "/tmp/vision-cache.sqlite3"))
+    if kind == "dynamodb":
+        return DynamoDBBackend(os.environ[f"{prefix}_TABLE_NAME"])
+    if kind == "s3":
+        return S3Backend(
+            os.getenv(f"{prefix}_BUCKET", os.getenv("BUCKET_NAME")),
+            os.getenv(f"{prefix}_S3_PREFIX", "results/")
+        )
+    return None
+
+
+def cache_from_env(prefix="CACHE", default_size=256, default_ttl=3600):
+    """Cria um ResultCache configurado pelas variáveis <PREFIX>_MAX_SIZE, <PREFIX>_TTL e <PREFIX>_BACKEND."""
+    ttl = int(os.getenv(f"{prefix}_TTL", default_ttl))
+    memory = LRUCache(max_size=int(os.getenv(f"{prefix}_MAX_SIZE", default_size)), ttl=ttl)
+    return ResultCache(memory=memory, backend=backend_from_env(prefix), ttl=ttl)
@@ -0,0 +1,114 @@
+"""Pré-filtro local de presença de rostos (Haar cascade do OpenCV, na CPU).
+
+Imagens em que o detector local não encontra nenhum rosto não são enviadas ao
+detect_faces. Uma fração delas (FACE_PREFILTER_SAMPLE_RATE) segue mesmo assim
+para o Rekognition, para medir os falsos negativos e ajustar o limiar.
+
+O limiar é o minNeighbors do detector (FACE_PREFILTER_MIN_NEIGHBORS): valores
+menores encontram mais rostos e pulam menos imagens (mais conservador).
+"""
+import os
+import random
+import threading
+
+from utils.timing import ReportedCounters, emit_emf
+
+PREFILTER_ENABLED = os.getenv('FACE_PREFILTER', 'false').lower() == 'true'
+PREFILTER_MAX_DIMENSION = int(os.getenv('FACE_PREFILTER_MAX_DIMENSION', 320))
+PREFILTER_MIN_NEIGHBORS = int(os.getenv('FACE_PREFILTER_MIN_NEIGHBORS', 3))
+PREFILTER_MIN_SIZE = int(os.getenv('FACE_PREFILTER_MIN_SIZE', 16))
+PREFILTER_SAMPLE_RATE = float(os.getenv('FACE_PREFILTER_SAMPLE_RATE', 0.05))
+# Validade (s) do resultado vazio de uma imagem pulada: é uma estimativa local, não a resposta do Rekognition
+PREFILTER_CACHE_TTL = int(os.getenv('FACE_PREFILTER_CACHE_TTL', 300))
+
+# OpenCV é opcional e só é importado quando o pré-filtro está habilitado
+cv2 = None
+numpy = None
+if PREFILTER_ENABLED:
+    try:
+        import cv2
+        import numpy
+    except ImportError:
+        print("OpenCV não está instalado; pré-filtro de rostos desabilitado.")
+
+
+def prefilter_enabled():
+    return PREFILTER_ENABLED and cv2 is not None
+
+
+class FacePrefilter:
+    """Estima o número de rostos e acumula as estatísticas de acerto do pré-filtro."""
+
+    def __init__(self, max_dimension=None, min_neighbors=None, min_size=None, sample_rate=None):
+        self.max_dimension = max_dimension or PREFILTER_MAX_DIMENSION
+        self.min_neighbors = min_neighbors or PREFILTER_MIN_NEIGHBORS
+        self.min_size = min_size or PREFILTER_MIN_SIZE
+        self.sample_rate = PREFILTER_SAMPLE_RATE if sample_rate is None else sample_rate
+        # O CascadeClassifier não deve ser compartilhado entre threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.reported = ReportedCounters(self._lock)
+        self.stats = {
+            "skipped": 0,          # Sem rosto localmente: Rekognition não chamado
+            "sampled": 0,          # Sem rosto localmente, mas enviado ao Rekognition por amostragem
+            "false_negatives": 0,  # Amostradas em que o Rekognition encontrou rostos
+            "hits": 0,             # Rekognition confirmou a estimativa local (com ou sem rostos)
+            "misses": 0            # Rekognition discordou da estimativa local
+        }
+
+    def _classifier(self):
+        classifier = getattr(self._local, 'classifier', None)
+        if classifier is None:
+            classifier = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            self._local.classifier = classifier
+        return classifier
+
+    def estimate(self, data):
+        """Estima quantos rostos há na imagem, a partir de uma decodificação reduzida em tons de cinza."""
+        image = cv2.imdecode(numpy.frombuffer(data, dtype=numpy.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_2)
+        if image is None:
+            raise ValueError("Could not decode image")
+        height, width = image.shape[:2]
+        scale = self.max_dimension / max(height, width)
+        if scale < 1:
+            image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        faces = self._classifier().detectMultiScale(
+            image, scaleFactor=1.1, minNeighbors=self.min_neighbors, minSize=(self.min_size, self.min_size)
+        )
+        return len(faces)
+
+    def should_skip(self, predicted):
+        """Decide se o Rekognition pode ser pulado; parte das imagens sem rosto é amostrada."""
+        if predicted > 0:
+            return False
+        sampled = random.random() < self.sample_rate
+        with self._lock:
+            self.stats["sampled" if sampled else "skipped"] += 1
+        return not sampled
+
+    def record(self, predicted, actual):
+        """Registra o resultado do Rekognition para uma imagem que passou pelo pré-filtro."""
+        with self._lock:
+            if (predicted > 0) == (actual > 0):
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+                if predicted == 0:
+                    self.stats["false_negatives"] += 1
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["false_negative_rate"] = round(stats["false_negatives"] / stats["sampled"], 4) if stats["sampled"] else None
+        return stats
+
+
+def emit_prefilter_metrics(prefilter):
+    """Publica as estatísticas do pré-filtro em formato EMF."""
+    stats = prefilter.metrics()
+    names = {
+        "skipped": "PrefilterSkipped", "sampled": "PrefilterSampled",
+        "false_negatives": "PrefilterFalseNegatives", "hits": "PrefilterHits", "misses": "PrefilterMisses"
+    }
+    deltas = prefilter.reported.deltas({name: stats[key] for key, name in names.items()})
+    emit_emf({name: (value, "Count") for name, value in deltas.items()}, Component="face_prefilter")
@@ -0,0 +1,99 @@
+import io
+import os
+import threading
+
+from utils.aws_clients import limited_client
+from utils.rate_limit import limited_call
+
+# Limite de tamanho do parâmetro Image.Bytes do Rekognition
+REKOGNITION_MAX_BYTES = 5 * 1024 * 1024
+
+PREPROCESS_ENABLED = os.getenv('IMAGE_PREPROCESS', 'false').lower() == 'true'
+MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', 1600))
+JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', 85))
+
+# Pillow é opcional e só é importado quando o pré-processamento está habilitado
+# (sem ele as imagens seguem para o Rekognition sem alteração)
+Image = None
+if PREPROCESS_ENABLED:
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Pillow não está instalado; pré-processamento de imagens desabilitado.")
+
+
+def preprocess_enabled():
+    return PREPROCESS_ENABLED and Image is not None
+
+
+def preprocess_image(data, max_dimension=None, quality=None):
+    """Reduz a imagem para a dimensão máxima e recomprime em JPEG.
+
+    As posições devolvidas pelo Rekognition são relativas ao tamanho da imagem,
+    então continuam válidas para o original. A orientação EXIF é preservada.
+    """
+    if Image is None:
+        return data
+
+    max_dimension = max_dimension or MAX_DIMENSION
+    quality = quality or JPEG_QUALITY
+
+    with Image.open(io.BytesIO(data)) as image:
+        if max(image.size) <= max_dimension and image.format == 'JPEG' and len(data) <= REKOGNITION_MAX_BYTES:
+            return data
+
+        exif = image.info.get('exif')
+        # Para JPEG, decodifica direto em resolução reduzida (bem mais rápido que decodificar tudo)
+        image.draft('RGB', (max_dimension, max_dimension))
+        image = image.convert('RGB')
+        image.thumbnail((max_dimension, max_dimension))
+
+        # Recomprime reduzindo a qualidade até caber no limite do Rekognition
+        while True:
+            output = io.BytesIO()
+            options = {'format': 'JPEG', 'quality': quality, 'optimize': True}
+            if exif:
+                options['exif'] = exif
+            image.save(output, **options)
+            if output.tell() <= REKOGNITION_MAX_BYTES or quality <= 40:
+                return output.getvalue()
+            quality -= 15
+
+
+class ImageSource:
+    """Imagem de uma requisição: o original é baixado do S3 e pré-processado no máximo uma vez.
+
+    detect_faces, detect_labels e as etapas locais (hash perceptual, pré-filtro de
+    rostos) recebem a mesma instância em vez de cada uma buscar a imagem de novo.
+    """
+
+    def __init__(self, bucket, key):
+        self.bucket = bucket
+        self.key = key
+        self._lock = threading.Lock()
+        self._data = None
+        self._image = None
+
+    def data(self):
+        """Bytes originais do objeto (um único GET no S3)."""
+        with self._lock:
+            if self._data is None:
+                self._data = limited_call(
+                    's3.get_object', limited_client('s3').get_object, Bucket=self.bucket, Key=self.key
+                )['Body'].read()
+            return self._data
+
+    def rekognition_image(self):
+        """Parâmetro Image do Rekognition, pré-processando a imagem quando habilitado."""
+        if not preprocess_enabled():
+            return {'S3Object': {'Bucket': self.bucket, 'Name': self.key}}
+        data = self.data()
+        with self._lock:
+            if self._image is None:
+                self._image = {'Bytes': preprocess_image(data)}
+            return self._image
+
+
+def rekognition_image(bucket, key):
+    """Monta o parâmetro Image do Rekognition, pré-processando a imagem do S3 quando habilitado."""
+    return ImageSource(bucket, key).rekognition_image()
@@ -0,0 +1,229 @@
+"""Modo assíncrono: fila de jobs, armazenamento de status e pool de workers.
+
+Cada fila/armazenamento tem uma implementação local (memória ou SQLite), usada
+em testes de carga offline, e uma implementação AWS (SQS e DynamoDB).
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+from utils.aws_clients import get_client
+
+# Status possíveis de um job
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+SUCCEEDED = "SUCCEEDED"
+FAILED = "FAILED"
+
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+class InMemoryQueue:
+    """Fila local em memória."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def send(self, message):
+        self._queue.put(message)
+
+    def receive(self, timeout=1.0):
+        """Retorna a próxima mensagem ou None se a fila estiver vazia após o timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SQSQueue:
+    """Fila no Amazon SQS (o consumo em produção é feito pelo gatilho SQS do Lambda)."""
+
+    def __init__(self, queue_url):
+        self.queue_url = queue_url
+
+    def send(self, message):
+        get_client('sqs').send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(message))
+
+    def receive(self, timeout=1.0):
+        response = get_client('sqs').receive_message(
+            QueueUrl=self.queue_url, MaxNumberOfMessages=1, WaitTimeSeconds=int(timeout)
+        )
+        for message in response.get('Messages', []):
+            get_client('sqs').delete_message(QueueUrl=self.queue_url, ReceiptHandle=message['ReceiptHandle'])
+            return json.loads(message['Body'])
+        return None
+
+
+class InMemoryJobStore:
+    """Armazenamento local de jobs em memória."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id, request):
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "jobId": job_id, "status": QUEUED, "request": request,
+                "createdAt": now, "updatedAt": now
+            }
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields, updatedAt=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+class SQLiteJobStore:
+    """Armazenamento local de jobs em um arquivo SQLite."""
+
+    def __init__(self, path="/tmp/vision-jobs.sqlite3"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs "
+            "(job_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _save(self, job):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, data, updated_at) VALUES (?, ?, ?)",
+            (job["jobId"], json.dumps(job), job["updatedAt"])
+        )
+        self._conn.commit()
+
+    def create(self, job_id, request):
+        now = time.time()
+        with self._lock:
+            self._save({
+                "jobId": job_id, "status": QUEUED, "request": request,
+                "createdAt": now, "updatedAt": now
+            })
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            job = json.loads(row[0])
+            job.update(fields, updatedAt=time.time())
+            self._save(job)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class DynamoDBJobStore:
+    """Armazenamento de jobs em uma tabela do DynamoDB (chave de partição 'jobId')."""
+
+    def __init__(self, table_name, ttl=86400):
+        self.table_name = table_name
+        self.ttl = ttl
+
+    def create(self, job_id, request):
+        now = time.time()
+        job = {
+            "jobId": job_id, "status": QUEUED, "request": request,
+            "createdAt": now, "updatedAt": now
+        }
+        get_client('dynamodb').put_item(
+            TableName=self.table_name,
+            Item={
+                'jobId': {'S': job_id},
+                'data': {'S': json.dumps(job)},
+                'expires_at': {'N': str(int(now + self.ttl))}
+            }
+        )
+
+    def update(self, job_id, **fields):
+        job = self.get(job_id)
+        job.update(fields, updatedAt=time.time())
+        get_client('dynamodb').put_item(
+            TableName=self.table_name,
+            Item={
+                'jobId': {'S': job_id},
+                'data': {'S': json.dumps(job)},
+                'expires_at': {'N': str(int(time.time() + self.ttl))}
+            }
+        )
+
+    def get(self, job_id):
+        item = get_client('dynamodb').get_item(
+            TableName=self.table_name, Key={'jobId': {'S': job_id}}, ConsistentRead=True
+        ).get('Item')
+        return json.loads(item['data']['S']) if item else None
+
+
+def run_job(job_store, message, processor):
+    """Executa um job da fila e registra o resultado (ou o erro) no armazenamento."""
+    job_id = message["jobId"]
+    job_store.update(job_id, status=RUNNING)
+    try:
+        result = processor(message["request"])
+        job_store.update(job_id, status=SUCCEEDED, result=result)
+    except Exception as e:
+        traceback.print_exc()
+        job_store.update(job_id, status=FAILED, error=str(e))
+
+
+class WorkerPool:
+    """Pool de threads que consome a fila e executa os jobs."""
+
+    def __init__(self, job_queue, job_store, processor, workers=4):
+        self.job_queue = job_queue
+        self.job_store = job_store
+        self.processor = processor
+        self.workers = workers
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _loop(self):
+        while not self._stop.is_set():
+            message = self.job_queue.receive(timeout=0.5)
+            if message is not None:
+                run_job(self.job_store, message, self.processor)
+
+    def start(self):
+        if self._threads:
+            return self
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"vision-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+def queue_from_env():
+    """JOB_QUEUE_BACKEND aceita 'sqs' (usa JOB_QUEUE_URL) ou 'memory' (padrão)."""
+    if os.getenv('JOB_QUEUE_BACKEND', 'memory').lower() == 'sqs':
+        return SQSQueue(os.environ['JOB_QUEUE_URL'])
+    return InMemoryQueue()
+
+
+def job_store_from_env():
+    """JOB_STORE_BACKEND aceita 'dynamodb', 'sqlite' ou 'memory' (padrão)."""
+    kind = os.getenv('JOB_STORE_BACKEND', 'memory').lower()
+    if kind == 'dynamodb':
+        return DynamoDBJobStore(os.environ['JOB_TABLE_NAME'])
+    if kind == 'sqlite':
+        return SQLiteJobStore(os.getenv('JOB_SQLITE_PATH', '/tmp/vision-jobs.sqlite3'))
+    return InMemoryJobStore()
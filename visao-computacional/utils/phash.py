@@ -0,0 +1,106 @@
+"""Hash perceptual (dHash) e índice BK-tree para encontrar imagens quase idênticas.
+
+Rajadas, reenvios com outro nome e cópias redimensionadas geram hashes a poucos
+bits de distância (Hamming); o BK-tree encontra o vizinho mais próximo sem
+comparar com todas as imagens já analisadas.
+"""
+import io
+import os
+import threading
+
+PHASH_DEDUP = os.getenv('PHASH_DEDUP', 'false').lower() == 'true'
+PHASH_MAX_DISTANCE = int(os.getenv('PHASH_MAX_DISTANCE', 6))
+PHASH_INDEX_SIZE = int(os.getenv('PHASH_INDEX_SIZE', 10000))
+
+# Pillow é opcional e só é importado quando a deduplicação está habilitada
+Image = None
+if PHASH_DEDUP:
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Pillow não está instalado; deduplicação por hash perceptual desabilitada.")
+
+
+def dedup_enabled():
+    return PHASH_DEDUP and Image is not None
+
+
+def dhash(data, size=8):
+    """Calcula o dHash de `size`x`size` bits a partir de uma decodificação reduzida da imagem."""
+    with Image.open(io.BytesIO(data)) as image:
+        # Para JPEG, decodifica direto em resolução reduzida
+        image.draft('L', (size * 8, size * 8))
+        pixels = image.convert('L').resize((size + 1, size), Image.BILINEAR).tobytes()
+
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Árvore BK sobre a distância de Hamming: cada filho fica na aresta da sua distância ao pai."""
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._root = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def add(self, hash_value, value):
+        with self._lock:
+            if self.max_size and self._size >= self.max_size:
+                # Índice cheio: recomeça (a árvore não suporta remoção eficiente)
+                self._root = None
+                self._size = 0
+            self._size += 1
+            if self._root is None:
+                self._root = [hash_value, value, {}]
+                return
+            node = self._root
+            while True:
+                distance = hamming(hash_value, node[0])
+                if distance == 0:
+                    # Mesmo hash: guarda o resultado mais recente
+                    node[1] = value
+                    self._size -= 1
+                    return
+                child = node[2].get(distance)
+                if child is None:
+                    node[2][distance] = [hash_value, value, {}]
+                    return
+                node = child
+
+    def nearest(self, hash_value, max_distance, exclude=None):
+        """Retorna (distância, valor) do item mais próximo até `max_distance`, ou None.
+
+        Itens para os quais `exclude(valor)` é verdadeiro não são candidatos (ex.: a própria imagem).
+        """
+        with self._lock:
+            if self._root is None:
+                return None
+            best = None
+            stack = [self._root]
+            while stack:
+                node_hash, node_value, children = stack.pop()
+                distance = hamming(hash_value, node_hash)
+                if distance <= max_distance and (best is None or distance < best[0]) \
+                        and not (exclude is not None and exclude(node_value)):
+                    best = (distance, node_value)
+                    if distance == 0:
+                        break
+                radius = best[0] if best is not None else max_distance
+                # Pela desigualdade triangular, só as arestas em [d - r, d + r] podem conter candidatos
+                for edge, child in children.items():
+                    if distance - radius <= edge <= distance + radius:
+                        stack.append(child)
+            return best
@@ -0,0 +1,64 @@
+"""Executor de pipeline em cascata: etapas com dependências e condições.
+
+Cada etapa só roda depois das etapas de que depende; etapas independentes rodam
+em paralelo. Uma etapa cuja condição não é satisfeita é pulada e o motivo é
+registrado, para que o cliente saiba por que um campo não veio na resposta.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Stage:
+    """Etapa do pipeline.
+
+    `func(results)` recebe os resultados das etapas já concluídas. `when(results)`
+    decide se a etapa deve rodar; quando retorna False, a etapa é pulada com `reason`.
+    """
+
+    def __init__(self, name, func, after=(), when=None, reason="condition not met"):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+        self.when = when
+        self.reason = reason
+
+
+def run_pipeline(stages, max_workers=4):
+    """Executa as etapas e retorna (resultados, etapas puladas com o motivo)."""
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        missing = set(stage.after) - names
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {', '.join(sorted(missing))}")
+
+    results = {}
+    skipped = {}
+    waiting = list(stages)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while waiting or running:
+            # Dispara (ou pula) toda etapa cujas dependências já terminaram; pular uma
+            # etapa pode liberar outras, por isso repete até não haver mudança
+            progress = True
+            while progress:
+                progress = False
+                for stage in list(waiting):
+                    if any(dep not in results and dep not in skipped for dep in stage.after):
+                        continue
+                    waiting.remove(stage)
+                    progress = True
+                    if stage.when is not None and not stage.when(results):
+                        skipped[stage.name] = stage.reason
+                    else:
+                        running[executor.submit(stage.func, dict(results))] = stage.name
+
+            if not running:
+                if waiting:
+                    raise ValueError("Pipeline has a dependency cycle")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    return results, skipped
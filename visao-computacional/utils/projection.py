@@ -0,0 +1,64 @@
+"""Projeção de campos: cada requisição escolhe o que quer receber via `fields`.
+
+Campos aceitos: emotion, bbox, labels e narrative.
+"""
+
+VALID_FIELDS = ('emotion', 'bbox', 'labels', 'narrative')
+
+
+def parse_fields(value, default, allowed=VALID_FIELDS):
+    """Normaliza o parâmetro `fields` (lista ou texto separado por vírgulas)."""
+    if value is None:
+        return set(default)
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        raise ValueError("'fields' must be a list or a comma separated string")
+
+    fields = {str(field).strip().lower() for field in value if str(field).strip()}
+    invalid = fields - set(allowed)
+    if invalid or not fields:
+        raise ValueError(f"Invalid 'fields': {', '.join(sorted(invalid)) or 'empty'}. Allowed: {', '.join(allowed)}")
+    return fields
+
+
+def face_attributes(fields):
+    """Menor conjunto de atributos do detect_faces que atende aos campos pedidos."""
+    if 'emotion' in fields or 'narrative' in fields:
+        return ['EMOTIONS']
+    # DEFAULT já inclui o BoundingBox
+    return ['DEFAULT']
+
+
+def project_face(face, fields):
+    """Monta a saída de uma face lendo apenas as chaves necessárias do FaceDetails.
+
+    Retorna None quando a emoção foi pedida mas o Rekognition não a classificou.
+    """
+    face_data = {}
+    if 'bbox' in fields:
+        face_data["position"] = face['BoundingBox']
+    if 'emotion' in fields or 'narrative' in fields:
+        emotions = face.get('Emotions')
+        if not emotions:
+            return None
+        primary_emotion = max(emotions, key=lambda x: x['Confidence'])
+        face_data["classified_emotion"] = primary_emotion['Type']
+        face_data["classified_emotion_confidence"] = primary_emotion['Confidence']
+    return face_data
+
+
+def project_faces(faces, fields):
+    projected = (project_face(face, fields) for face in faces)
+    return [face_data for face_data in projected if face_data is not None]
+
+
+def empty_face(fields):
+    """Face vazia usada quando nenhuma face é detectada."""
+    face_data = {}
+    if 'bbox' in fields:
+        face_data["position"] = {"Height": None, "Left": None, "Top": None, "Width": None}
+    if 'emotion' in fields or 'narrative' in fields:
+        face_data["classified_emotion"] = None
+        face_data["classified_emotion_confidence"] = None
+    return face_data
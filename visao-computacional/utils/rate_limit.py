@@ -0,0 +1,166 @@
+import os
+import random
+import threading
+import time
+
+from utils.timing import ReportedCounters, emit_emf
+
+
+class TokenBucket:
+    """Limita a taxa de chamadas (tokens por segundo) com uma rajada máxima."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, tokens=1.0):
+        """Bloqueia até haver tokens disponíveis."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Códigos de erro que indicam limitação de taxa pelos serviços AWS
+THROTTLE_CODES = {
+    'ThrottlingException', 'Throttling', 'TooManyRequestsException',
+    'ProvisionedThroughputExceededException', 'LimitExceededException',
+    'RequestLimitExceeded', 'SlowDown', 'ServiceQuotaExceededException'
+}
+
+
+def is_throttle(error):
+    """Indica se a exceção é um erro de limitação de taxa (ThrottlingException e similares)."""
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return code in THROTTLE_CODES
+
+
+class AdaptiveLimiter:
+    """Limitador por API: token bucket + concorrência adaptativa (AIMD) + backoff com jitter.
+
+    A cada sucesso o limite de concorrência sobe 1/limite (aumento aditivo); a cada
+    throttling ele cai pela metade (redução multiplicativa), convergindo para o
+    maior throughput sustentável sem oscilar.
+    """
+
+    def __init__(self, name, rate, max_concurrency=16, min_concurrency=1,
+                 max_attempts=5, base_delay=0.1, max_delay=5.0):
+        self.name = name
+        self.bucket = TokenBucket(rate)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.calls = 0
+        self.throttles = 0
+        self._condition = threading.Condition()
+        self.reported = ReportedCounters(self._condition)
+
+    def _acquire_slot(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def _release_slot(self, throttled):
+        with self._condition:
+            self.in_flight -= 1
+            self.calls += 1
+            if throttled:
+                self.throttles += 1
+                self.limit = max(self.min_concurrency, self.limit / 2)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def call(self, func, *args, **kwargs):
+        """Executa a chamada respeitando os limites e refazendo-a em caso de throttling."""
+        for attempt in range(self.max_attempts):
+            self.bucket.acquire()
+            self._acquire_slot()
+            throttled = False
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                throttled = is_throttle(e)
+                if not throttled or attempt == self.max_attempts - 1:
+                    raise
+            finally:
+                self._release_slot(throttled)
+            # Backoff exponencial com "full jitter"
+            time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def metrics(self):
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "throttles": self.throttles
+        }
+
+
+# Taxa padrão (chamadas por segundo) de cada API; ajustável por RATE_LIMIT_<API>_TPS
+DEFAULT_RATES = {
+    'rekognition.detect_faces': 50,
+    'rekognition.detect_labels': 50,
+    'bedrock.invoke_model': 10,
+    'bedrock.invoke_model_with_response_stream': 10,
+    's3.head_object': 500,
+    's3.get_object': 500
+}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def limiter_for(api):
+    """Retorna o limitador compartilhado da API (ex.: 'rekognition.detect_faces')."""
+    limiter = _limiters.get(api)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(api)
+            if limiter is None:
+                env_name = api.upper().replace('.', '_')
+                limiter = AdaptiveLimiter(
+                    api,
+                    rate=float(os.getenv(f'RATE_LIMIT_{env_name}_TPS', DEFAULT_RATES.get(api, 50))),
+                    max_concurrency=int(os.getenv(f'RATE_LIMIT_{env_name}_CONCURRENCY', 16))
+                )
+                _limiters[api] = limiter
+    return limiter
+
+
+def limited_call(api, func, **kwargs):
+    """Executa uma chamada AWS pelo limitador da API correspondente.
+
+    Use um cliente de utils.aws_clients.limited_client: as novas tentativas ficam só a cargo do limitador.
+    """
+    return limiter_for(api).call(func, **kwargs)
+
+
+def emit_rate_limit_metrics():
+    """Publica o limite atual e a contagem de throttling de cada API em formato EMF."""
+    for api, limiter in list(_limiters.items()):
+        metrics = limiter.metrics()
+        deltas = limiter.reported.deltas({"Throttles": metrics["throttles"], "Calls": metrics["calls"]})
+        emit_emf(
+            {
+                "ConcurrencyLimit": (metrics["limit"], "Count"),
+                **{name: (value, "Count") for name, value in deltas.items()}
+            },
+            Api=api
+        )
@@ -0,0 +1,214 @@
+"""Resiliência para chamadas lentas: hedge por percentil de latência e circuit breaker."""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from utils.timing import ReportedCounters, emit_emf
+
+# Estados do circuit breaker
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class LatencyTracker:
+    """Janela das latências recentes (em segundos) de uma chamada."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        """Retorna o percentil `p` (0-100) ou None enquanto houver poucas amostras."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+
+
+class CircuitBreaker:
+    """Abre após `failure_threshold` falhas seguidas e rejeita chamadas por `reset_timeout` segundos.
+
+    Passado esse tempo, deixa passar uma única chamada de teste (HALF_OPEN): se ela
+    funcionar o circuito fecha, se falhar volta a abrir.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opens = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self.reported = ReportedCounters(self._lock)
+
+    def allow(self):
+        """Indica se a chamada pode ser feita agora."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opens += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def metrics(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opens": self.opens,
+            "rejected": self.rejected
+        }
+
+
+class HedgedCaller:
+    """Executa a chamada e, se ela passar do percentil `percentile` das latências recentes,
+    dispara uma segunda idêntica e usa a que terminar primeiro com sucesso.
+
+    Enquanto não houver amostras suficientes, o atraso do hedge é `default_delay`.
+    Se nenhuma terminar em `timeout` segundos, levanta TimeoutError. Cada tentativa
+    roda na sua própria thread (um pool compartilhado ficaria preso nas chamadas
+    abandonadas); o cliente usado deve ter read_timeout <= `timeout` para que elas
+    terminem logo depois. Resultados que chegam depois do vencedor vão para `discard`.
+    """
+
+    def __init__(self, name, percentile=95.0, default_delay=2.0, timeout=10.0):
+        self.name = name
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.timeout = timeout
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+        self.reported = ReportedCounters(self._lock)
+
+    def hedge_delay(self):
+        delay = self.latency.percentile(self.percentile)
+        return self.default_delay if delay is None else delay
+
+    def _start(self, func):
+        future = Future()
+
+        def run():
+            inicio = time.monotonic()
+            try:
+                result = func()
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            self.latency.record(time.monotonic() - inicio)
+            future.set_result(result)
+
+        threading.Thread(target=run, name=f"hedge-{self.name}", daemon=True).start()
+        return future
+
+    def call(self, func, *args, **kwargs):
+        return self.hedge(lambda: func(*args, **kwargs))
+
+    def hedge(self, func, discard=None):
+        """Executa `func` (sem argumentos) com hedge; `discard` recebe o resultado de quem perder."""
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            self.calls += 1
+
+        primary = self._start(func)
+        done, _ = wait([primary], timeout=min(self.hedge_delay(), self.timeout))
+        if primary in done:
+            return primary.result()
+
+        with self._lock:
+            self.hedges += 1
+        hedge = self._start(func)
+
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    self._discard_late(pending | (done - {future}), discard)
+                    return future.result()
+                error = future.exception()
+
+        self._discard_late(pending, discard)
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"{self.name}: sem resposta em {self.timeout}s")
+
+    @staticmethod
+    def _discard_late(futures, discard):
+        if discard is None:
+            return
+
+        def descartar(future):
+            if future.exception() is None:
+                try:
+                    discard(future.result())
+                except Exception as e:
+                    print(f"Erro ao descartar a resposta do hedge: {e}")
+
+        for future in futures:
+            future.add_done_callback(descartar)
+
+    def metrics(self):
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay": round(self.hedge_delay(), 3)
+        }
+
+
+def emit_resilience_metrics(breaker, hedger):
+    """Publica o estado do circuit breaker e a taxa de vitória do hedge em formato EMF."""
+    breaker_metrics = breaker.metrics()
+    hedger_metrics = hedger.metrics()
+    deltas = breaker.reported.deltas({
+        "BreakerOpens": breaker_metrics["opens"],
+        "BreakerRejected": breaker_metrics["rejected"]
+    })
+    deltas.update(hedger.reported.deltas({
+        "HedgedCalls": hedger_metrics["calls"],
+        "Hedges": hedger_metrics["hedges"],
+        "HedgeWins": hedger_metrics["hedge_wins"]
+    }))
+
+    metrics = {name: (value, "Count") for name, value in deltas.items()}
+    metrics["BreakerState"] = (_STATE_VALUES[breaker_metrics["state"]], "None")
+    metrics["HedgeDelay"] = (hedger_metrics["hedge_delay"] * 1000, "Milliseconds")
+    emit_emf(metrics, Api=breaker.name)
@@ -0,0 +1,389 @@
+"""Índice consultável dos resultados de análise (emoção, confiança, etiqueta e data).
+
+Duas implementações com a mesma interface (`add` e `search`):
+
+- SQLiteResultIndex: arquivo local, para desenvolvimento e testes. No Lambda o
+  arquivo fica no /tmp de cada container, então não é compartilhado.
+- DynamoDBResultIndex: tabela compartilhada por todas as funções (vision,
+  visionStream, precompute e visionSearch), usada no deploy.
+
+Nas duas, a consulta parte da emoção ou da etiqueta pedida (e não de todas as
+imagens), já na ordem da paginação: mais recentes primeiro, por (analyzed_at, url).
+"""
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Tamanho máximo de página da busca
+SEARCH_MAX_LIMIT = 100
+
+# Sem emoção nem etiqueta, o DynamoDB percorre uma partição por dia: janela padrão sem 'from'
+SEARCH_MAX_DAYS = int(os.getenv('RESULT_INDEX_MAX_DAYS', 30))
+
+
+def encode_cursor(analyzed_at, url):
+    return base64.urlsafe_b64encode(json.dumps([analyzed_at, url]).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decodifica o cursor de paginação; levanta ValueError se for inválido."""
+    try:
+        analyzed_at, url = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(analyzed_at), str(url)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError("Invalid cursor.")
+
+
+def _summarize(response_body):
+    """Maior confiança por emoção, confiança por etiqueta e maior confiança entre as faces."""
+    emotions = {}
+    for face in response_body.get("faces") or []:
+        emotion = face.get("classified_emotion")
+        confidence = face.get("classified_emotion_confidence")
+        if emotion is None or confidence is None:
+            continue
+        emotions[emotion] = max(confidence, emotions.get(emotion, confidence))
+    etiquetas = response_body.get("etiquetas")
+    labels = {
+        label["Name"]: label.get("Confidence")
+        for label in (etiquetas if isinstance(etiquetas, list) else [])
+    }
+    max_confidence = max(emotions.values()) if emotions else None
+    return emotions, labels, max_confidence
+
+
+class SQLiteResultIndex:
+    """Índice de resultados em um arquivo SQLite."""
+
+    SCHEMA_VERSION = 2
+
+    def __init__(self, path="/tmp/vision-index.sqlite3"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            # O índice é derivado das análises: um esquema antigo é recriado
+            self._conn.executescript(
+                """
+                DROP TABLE IF EXISTS faces;
+                DROP TABLE IF EXISTS labels;
+                DROP TABLE IF EXISTS face_emotions;
+                DROP TABLE IF EXISTS image_labels;
+                DROP TABLE IF EXISTS images;
+                """
+            )
+        # Uma linha por (imagem, emoção) e por (imagem, etiqueta), com a data da análise
+        # repetida: os índices por (emoção|etiqueta, analyzed_at, url) já entregam a ordem da página
+        self._conn.executescript(
+            f"""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                bucket TEXT NOT NULL,
+                image_key TEXT NOT NULL,
+                analyzed_at REAL NOT NULL,
+                max_confidence REAL,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS face_emotions (
+                url TEXT NOT NULL,
+                emotion TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                analyzed_at REAL NOT NULL,
+                PRIMARY KEY (url, emotion)
+            );
+            CREATE TABLE IF NOT EXISTS image_labels (
+                url TEXT NOT NULL,
+                name TEXT NOT NULL COLLATE NOCASE,
+                confidence REAL,
+                analyzed_at REAL NOT NULL,
+                PRIMARY KEY (url, name)
+            );
+            CREATE INDEX IF NOT EXISTS images_analyzed_at ON images (analyzed_at, url);
+            CREATE INDEX IF NOT EXISTS face_emotions_emotion ON face_emotions (emotion, analyzed_at, url, confidence);
+            CREATE INDEX IF NOT EXISTS image_labels_name ON image_labels (name, analyzed_at, url, confidence);
+            PRAGMA user_version = {self.SCHEMA_VERSION};
+            """
+        )
+        self._conn.commit()
+
+    def add(self, bucket, image_key, response_body, analyzed_at=None):
+        """Grava (ou substitui) o resultado de uma imagem."""
+        url = response_body["url_to_image"]
+        analyzed_at = analyzed_at or time.time()
+        emotions, labels, max_confidence = _summarize(response_body)
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM face_emotions WHERE url = ?", (url,))
+            self._conn.execute("DELETE FROM image_labels WHERE url = ?", (url,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images (url, bucket, image_key, analyzed_at, max_confidence, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, bucket, image_key, analyzed_at, max_confidence, json.dumps(response_body))
+            )
+            self._conn.executemany(
+                "INSERT INTO face_emotions (url, emotion, confidence, analyzed_at) VALUES (?, ?, ?, ?)",
+                [(url, emotion, confidence, analyzed_at) for emotion, confidence in emotions.items()]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO image_labels (url, name, confidence, analyzed_at) VALUES (?, ?, ?, ?)",
+                [(url, name, confidence, analyzed_at) for name, confidence in labels.items()]
+            )
+
+    def search(self, emotion=None, min_confidence=None, label=None, min_label_confidence=None,
+               since=None, until=None, limit=20, cursor=None):
+        """Busca os resultados mais recentes primeiro; retorna (itens, cursor da próxima página)."""
+        conditions = []
+        params = []
+        if emotion is not None:
+            # Parte das linhas da emoção, na ordem do índice face_emotions_emotion
+            source = "face_emotions d JOIN images i ON i.url = d.url"
+            conditions.append("d.emotion = ?")
+            params.append(emotion.upper())
+            if min_confidence is not None:
+                conditions.append("d.confidence >= ?")
+                params.append(min_confidence)
+            if label is not None:
+                # Busca pontual pela chave primária (url, name)
+                label_conditions = ["l.url = d.url", "l.name = ?"]
+                params.append(label)
+                if min_label_confidence is not None:
+                    label_conditions.append("l.confidence >= ?")
+                    params.append(min_label_confidence)
+                conditions.append(f"EXISTS (SELECT 1 FROM image_labels l WHERE {' AND '.join(label_conditions)})")
+        elif label is not None:
+            # Parte das linhas da etiqueta, na ordem do índice image_labels_name (NOCASE)
+            source = "image_labels d JOIN images i ON i.url = d.url"
+            conditions.append("d.name = ?")
+            params.append(label)
+            if min_label_confidence is not None:
+                conditions.append("d.confidence >= ?")
+                params.append(min_label_confidence)
+            if min_confidence is not None:
+                conditions.append("i.max_confidence >= ?")
+                params.append(min_confidence)
+        else:
+            source = "images d JOIN images i ON i.url = d.url"
+            if min_confidence is not None:
+                conditions.append("d.max_confidence >= ?")
+                params.append(min_confidence)
+
+        if since is not None:
+            conditions.append("d.analyzed_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("d.analyzed_at < ?")
+            params.append(until)
+        if cursor is not None:
+            # Paginação por chave (analyzed_at, url): estável mesmo com inserções entre as páginas
+            analyzed_at, url = decode_cursor(cursor)
+            conditions.append("(d.analyzed_at < ? OR (d.analyzed_at = ? AND d.url < ?))")
+            params.extend([analyzed_at, analyzed_at, url])
+
+        limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT d.url, d.analyzed_at, i.data FROM {source} {where} "
+                "ORDER BY d.analyzed_at DESC, d.url DESC LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+
+        next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+        return [json.loads(data) for _, _, data in rows[:limit]], next_cursor
+
+
+class DynamoDBResultIndex:
+    """Índice de resultados em uma tabela do DynamoDB compartilhada pelas funções.
+
+    Cada imagem gera um item por emoção (EMOTION#<emoção>), um por etiqueta
+    (LABEL#<etiqueta em minúsculas>) e um da imagem (DAY#<data UTC>), todos com a
+    chave 'pk' = IMG#<url>. O GSI `GSI_NAME` (gsi1pk, gsi1sk) agrupa os itens
+    pelo filtro e os ordena por '<analyzed_at>#<url>': a consulta lê só a partição
+    da emoção/etiqueta pedida, já na ordem da página. Confiança e etiquetas ficam
+    no próprio item e são aplicadas como FilterExpression. O corpo da resposta
+    ('data') fica apenas no item da imagem (sk = IMG, fora do GSI) e é lido com
+    BatchGetItem para os itens da página.
+    """
+
+    GSI_NAME = 'by_filter'
+
+    def __init__(self, table_name, client=None):
+        self.table_name = table_name
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from utils.aws_clients import get_client
+
+            self._client = get_client('dynamodb')
+        return self._client
+
+    @staticmethod
+    def _sort_key(analyzed_at, url):
+        return f"{analyzed_at:017.6f}#{url}"
+
+    @staticmethod
+    def _day(analyzed_at):
+        return datetime.utcfromtimestamp(analyzed_at).strftime('%Y-%m-%d')
+
+    def add(self, bucket, image_key, response_body, analyzed_at=None):
+        """Grava (ou substitui) o resultado de uma imagem em uma única transação."""
+        url = response_body["url_to_image"]
+        analyzed_at = round(analyzed_at or time.time(), 6)
+        emotions, labels, max_confidence = _summarize(response_body)
+
+        base = {
+            'pk': {'S': f"IMG#{url}"},
+            'gsi1sk': {'S': self._sort_key(analyzed_at, url)},
+            'url': {'S': url},
+            'analyzed_at': {'N': f"{analyzed_at:.6f}"}
+        }
+        if max_confidence is not None:
+            base['max_confidence'] = {'N': str(max_confidence)}
+        label_map = {name.lower(): {'N': str(confidence or 0)} for name, confidence in labels.items()}
+
+        items = [dict(base, sk={'S': 'IMG'}, gsi1pk={'S': f"DAY#{self._day(analyzed_at)}"},
+                      bucket={'S': bucket}, image_key={'S': image_key}, data={'S': json.dumps(response_body)})]
+        for emotion, confidence in emotions.items():
+            items.append(dict(base, sk={'S': f"EMOTION#{emotion}"}, gsi1pk={'S': f"EMOTION#{emotion}"},
+                              confidence={'N': str(confidence)}, labels={'M': label_map}))
+        for name, confidence in labels.items():
+            key = f"LABEL#{name.lower()}"
+            items.append(dict(base, sk={'S': key}, gsi1pk={'S': key}, confidence={'N': str(confidence or 0)}))
+
+        # Itens de uma análise anterior que não existem mais (ex.: emoção diferente)
+        previous = self.client.query(
+            TableName=self.table_name,
+            KeyConditionExpression='pk = :pk',
+            ExpressionAttributeValues={':pk': base['pk']},
+            ProjectionExpression='pk, sk'
+        ).get('Items', [])
+        current = {item['sk']['S'] for item in items}
+        actions = [{'Put': {'TableName': self.table_name, 'Item': item}} for item in items]
+        actions += [
+            {'Delete': {'TableName': self.table_name, 'Key': {'pk': old['pk'], 'sk': old['sk']}}}
+            for old in previous if old['sk']['S'] not in current
+        ]
+        self.client.transact_write_items(TransactItems=actions)
+
+    def search(self, emotion=None, min_confidence=None, label=None, min_label_confidence=None,
+               since=None, until=None, limit=20, cursor=None):
+        """Busca os resultados mais recentes primeiro; retorna (itens, cursor da próxima página)."""
+        filters = []
+        names = {}
+        values = {}
+        if emotion is not None:
+            partitions = [f"EMOTION#{emotion.upper()}"]
+            if min_confidence is not None:
+                filters.append('confidence >= :min_confidence')
+                values[':min_confidence'] = {'N': str(min_confidence)}
+            if label is not None:
+                names['#label'] = label.lower()
+                if min_label_confidence is not None:
+                    filters.append('labels.#label >= :min_label_confidence')
+                    values[':min_label_confidence'] = {'N': str(min_label_confidence)}
+                else:
+                    filters.append('attribute_exists(labels.#label)')
+        elif label is not None:
+            partitions = [f"LABEL#{label.lower()}"]
+            if min_label_confidence is not None:
+                filters.append('confidence >= :min_label_confidence')
+                values[':min_label_confidence'] = {'N': str(min_label_confidence)}
+            if min_confidence is not None:
+                filters.append('max_confidence >= :min_confidence')
+                values[':min_confidence'] = {'N': str(min_confidence)}
+        else:
+            # Uma partição por dia, do mais recente para o mais antigo
+            last = until if until is not None else time.time()
+            first = since if since is not None else last - SEARCH_MAX_DAYS * 86400
+            if cursor is not None:
+                last = min(last, decode_cursor(cursor)[0] + 1)
+            day = datetime.utcfromtimestamp(last).date()
+            partitions = []
+            while day >= datetime.utcfromtimestamp(first).date():
+                partitions.append(f"DAY#{day.isoformat()}")
+                day -= timedelta(days=1)
+            if min_confidence is not None:
+                filters.append('max_confidence >= :min_confidence')
+                values[':min_confidence'] = {'N': str(min_confidence)}
+
+        # O limite superior ('to') é exclusivo: '<until>#<url>' > '<until>' fica fora do BETWEEN
+        values[':lo'] = {'S': f"{since:017.6f}" if since is not None else "0"}
+        values[':hi'] = {'S': f"{until:017.6f}" if until is not None else "~"}
+
+        # O cursor (analyzed_at, url) basta para remontar a chave do último item da página
+        start = None
+        if cursor is not None:
+            analyzed_at, url = decode_cursor(cursor)
+            start_partition = partitions[0] if emotion is not None or label is not None \
+                else f"DAY#{self._day(analyzed_at)}"
+            start = {
+                'pk': {'S': f"IMG#{url}"},
+                'sk': {'S': start_partition if emotion is not None or label is not None else 'IMG'},
+                'gsi1pk': {'S': start_partition},
+                'gsi1sk': {'S': self._sort_key(analyzed_at, url)}
+            }
+
+        limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+        rows = []
+        for partition in partitions:
+            params = {
+                'TableName': self.table_name,
+                'IndexName': self.GSI_NAME,
+                'KeyConditionExpression': 'gsi1pk = :partition AND gsi1sk BETWEEN :lo AND :hi',
+                'ExpressionAttributeValues': dict(values, **{':partition': {'S': partition}}),
+                'ScanIndexForward': False
+            }
+            if filters:
+                params['FilterExpression'] = ' AND '.join(filters)
+            if names:
+                params['ExpressionAttributeNames'] = names
+            if start is not None and start['gsi1pk']['S'] == partition:
+                params['ExclusiveStartKey'] = start
+
+            while len(rows) <= limit:
+                params['Limit'] = limit + 1 - len(rows)
+                response = self.client.query(**params)
+                rows.extend((float(item['analyzed_at']['N']), item['url']['S']) for item in response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            if len(rows) > limit:
+                break
+
+        rows = rows[:limit + 1]
+        next_cursor = encode_cursor(rows[limit - 1][0], rows[limit - 1][1]) if len(rows) > limit else None
+        data = self._read_data([url for _, url in rows[:limit]])
+        return [json.loads(data[url]) for _, url in rows[:limit] if url in data], next_cursor
+
+    def _read_data(self, urls):
+        """Lê o corpo da resposta dos itens de imagem da página (até SEARCH_MAX_LIMIT chaves)."""
+        data = {}
+        keys = [{'pk': {'S': f"IMG#{url}"}, 'sk': {'S': 'IMG'}} for url in dict.fromkeys(urls)]
+        request = {self.table_name: {
+            'Keys': keys,
+            'ProjectionExpression': '#url, #data',
+            'ExpressionAttributeNames': {'#url': 'url', '#data': 'data'}
+        }} if keys else {}
+        while request:
+            response = self.client.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(self.table_name, []):
+                data[item['url']['S']] = item['data']['S']
+            request = response.get('UnprocessedKeys') or {}
+        return data
+
+
+def index_from_env():
+    """RESULT_INDEX_BACKEND aceita 'sqlite' (padrão, em RESULT_INDEX_PATH), 'dynamodb'
+    (tabela RESULT_INDEX_TABLE_NAME, compartilhada entre as funções) ou 'none'."""
+    kind = os.getenv('RESULT_INDEX_BACKEND', 'sqlite').lower()
+    if kind == 'sqlite':
+        return SQLiteResultIndex(os.getenv('RESULT_INDEX_PATH', '/tmp/vision-index.sqlite3'))
+    if kind == 'dynamodb':
+        return DynamoDBResultIndex(os.environ['RESULT_INDEX_TABLE_NAME'])
+    return None
@@ -0,0 +1,182 @@
+"""Envio em massa de um diretório local para a pasta myphotos/ do bucket.
+
+Arquivos cujo MD5 (ou ETag multipart) local é igual ao ETag remoto são pulados;
+os demais são enviados em paralelo pelo s3transfer. O manifesto guarda os ETags
+já calculados/enviados para retomar uma execução interrompida sem recalculá-los.
+
+Uso:
+    python utils/s3_bulk_upload.py ./fotos --bucket gato-sapeca --prefix myphotos/ --workers 8
+"""
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Adiciona o caminho do diretório pai ao sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))  # Diretório atual (utils)
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))  # Diretório pai (visao-computacional)
+sys.path.append(parent_dir)
+
+from utils.aws_clients import get_client, load_env  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+MB = 1024 * 1024
+
+
+def iter_local_files(root, prefix):
+    """Gera (caminho local, chave no S3) das imagens do diretório, em ordem."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(dirpath, filename)
+                relative = os.path.relpath(path, root).replace(os.sep, '/')
+                yield path, f"{prefix}{relative}"
+
+
+def local_etag(path, threshold, chunksize):
+    """Calcula o ETag que o S3 atribuirá ao arquivo enviado com o TransferConfig informado.
+
+    Abaixo do limite de multipart é o MD5 do arquivo; acima, o MD5 dos MD5s das
+    partes seguido de '-<número de partes>'.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as file:
+        if size < threshold:
+            digest = hashlib.md5()
+            for block in iter(lambda: file.read(MB), b''):
+                digest.update(block)
+            return f'"{digest.hexdigest()}"'
+
+        part_digests = [hashlib.md5(part).digest() for part in iter(lambda: file.read(chunksize), b'')]
+    return f'"{hashlib.md5(b"".join(part_digests)).hexdigest()}-{len(part_digests)}"'
+
+
+def remote_etags(bucket, prefix):
+    """Lista os ETags remotos do prefixo de uma vez (evita um HEAD por arquivo)."""
+    etags = {}
+    for page in get_client('s3').get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            etags[obj['Key']] = obj['ETag']
+    return etags
+
+
+class Manifest:
+    """Manifesto {chave: {size, mtime, etag}} gravado de forma atômica."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as file:
+                self.entries = json.load(file)
+
+    def cached_etag(self, key, stat):
+        """ETag do manifesto se o arquivo não mudou desde que foi calculado."""
+        entry = self.entries.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return entry["etag"]
+        return None
+
+    def record(self, key, stat, etag):
+        with self._lock:
+            self.entries[key] = {"size": stat.st_size, "mtime": stat.st_mtime, "etag": etag}
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as file:
+                json.dump(self.entries, file)
+            os.replace(tmp_path, self.path)
+
+
+def transfer_config(threshold, chunksize, max_concurrency):
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=threshold,
+        multipart_chunksize=chunksize,
+        max_concurrency=max_concurrency,
+        use_threads=True
+    )
+
+
+def upload_file(bucket, path, key, config):
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    get_client('s3').upload_file(path, bucket, key, ExtraArgs={'ContentType': content_type}, Config=config)
+
+
+def run(root, bucket, prefix="myphotos/", workers=8, manifest_path=None, threshold_mb=8, chunksize_mb=8,
+        part_concurrency=4, dry_run=False):
+    threshold = threshold_mb * MB
+    chunksize = chunksize_mb * MB
+    manifest = Manifest(manifest_path or os.path.join(root, '.s3-upload-manifest.json'))
+    config = None if dry_run else transfer_config(threshold, chunksize, part_concurrency)
+
+    remote = remote_etags(bucket, prefix)
+    stats = {"uploaded": 0, "skipped": 0, "errors": 0, "bytes": 0}
+    inicio = time.time()
+
+    def processar(path, key):
+        stat = os.stat(path)
+        etag = manifest.cached_etag(key, stat) or local_etag(path, threshold, chunksize)
+        manifest.record(key, stat, etag)
+        if remote.get(key) == etag:
+            return "skipped", 0
+        if not dry_run:
+            upload_file(bucket, path, key, config)
+        return "uploaded", stat.st_size
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(processar, path, key): key for path, key in iter_local_files(root, prefix)}
+        for count, future in enumerate(as_completed(futures), 1):
+            try:
+                status, size = future.result()
+                stats[status] += 1
+                stats["bytes"] += size
+            except Exception as e:
+                # Um arquivo com erro não interrompe o envio dos demais
+                print(f"Erro ao enviar {futures[future]}: {e}")
+                stats["errors"] += 1
+            if count % 100 == 0:
+                manifest.save()
+                elapsed = time.time() - inicio
+                print(f"{count} arquivos ({stats['bytes'] / MB / elapsed:.1f} MB/s, {count / elapsed:.1f} arquivos/s)")
+
+    manifest.save()
+    elapsed = max(time.time() - inicio, 1e-9)
+    stats["seconds"] = round(elapsed, 2)
+    stats["mb_per_second"] = round(stats["bytes"] / MB / elapsed, 2)
+    stats["files_per_second"] = round((stats["uploaded"] + stats["skipped"]) / elapsed, 2)
+    print(json.dumps(stats))
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Envio em massa de imagens para a pasta myphotos/ do bucket.")
+    parser.add_argument('directory', help='Diretório local com as imagens')
+    parser.add_argument('--bucket', default=os.getenv('BUCKET_NAME'))
+    parser.add_argument('--prefix', default='myphotos/')
+    parser.add_argument('--workers', type=int, default=8, help='Arquivos enviados em paralelo')
+    parser.add_argument('--part-concurrency', type=int, default=4, help='Partes simultâneas por arquivo multipart')
+    parser.add_argument('--threshold-mb', type=int, default=8, help='Tamanho a partir do qual o envio é multipart')
+    parser.add_argument('--chunksize-mb', type=int, default=8, help='Tamanho de cada parte do multipart')
+    parser.add_argument('--manifest', help='Caminho do manifesto (padrão: <diretório>/.s3-upload-manifest.json)')
+    parser.add_argument('--dry-run', action='store_true', help='Só compara com o bucket, sem enviar')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    load_env()
+    args = parse_args()
+    if not args.bucket:
+        print("Informe o bucket com --bucket ou a variável BUCKET_NAME.")
+        sys.exit(1)
+    run(args.directory, args.bucket, args.prefix, args.workers, args.manifest, args.threshold_mb,
+        args.chunksize_mb, args.part_concurrency, args.dry_run)
@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+# Duração máxima de um lease entre containers e intervalo de consulta de quem espera
+LEASE_TTL = float(os.getenv('SINGLEFLIGHT_LEASE_TTL', 15))
+LEASE_POLL_INTERVAL = float(os.getenv('SINGLEFLIGHT_POLL_INTERVAL', 0.1))
+
+
+class SingleFlight:
+    """Agrupa chamadas simultâneas com a mesma chave: só a primeira executa, as demais aguardam o resultado."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+def run_with_lease(store, key, func, ttl=None, poll_interval=None):
+    """Executa `func` sob um lease curto no armazenamento de resultados.
+
+    Quem não obtém o lease aguarda o resultado ser gravado em `key` pelo dono do lease;
+    se o lease expirar sem resultado, executa a análise por conta própria.
+    """
+    if not hasattr(store, 'acquire_lease'):
+        return func()
+
+    ttl = ttl or LEASE_TTL
+    poll_interval = poll_interval or LEASE_POLL_INTERVAL
+    lease_key = f"{key}|lease"
+    deadline = time.monotonic() + ttl
+
+    while not store.acquire_lease(lease_key, ttl):
+        value = store.get(key)
+        if value is not None:
+            return value
+        if time.monotonic() > deadline:
+            return func()
+        time.sleep(poll_interval)
+
+    try:
+        # O dono anterior pode ter terminado logo antes de liberarmos o lease
+        value = store.get(key)
+        return value if value is not None else func()
+    finally:
+        store.release_lease(lease_key)
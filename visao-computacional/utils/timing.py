@@ -0,0 +1,103 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Namespace das métricas no CloudWatch e fração das requisições com dump de payload para debug
+METRICS_NAMESPACE = os.getenv('METRICS_NAMESPACE', 'VisionAPI')
+DEBUG_SAMPLE_RATE = float(os.getenv('DEBUG_SAMPLE_RATE', 0))
+
+# Resposta quando o throttling da AWS persiste mesmo após as novas tentativas do limitador
+BUSY_MESSAGE = "Service is busy, please retry."
+RETRY_AFTER_SECONDS = 1
+
+
+class Timer:
+    """Mede a duração de cada etapa de uma requisição."""
+
+    def __init__(self):
+        self.spans = {}
+
+    @contextmanager
+    def span(self, name):
+        """Cronometra o bloco; etapas com o mesmo nome são somadas."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[name] = self.spans.get(name, 0.0) + (time.perf_counter() - inicio) * 1000
+
+    def server_timing(self):
+        """Valor do cabeçalho Server-Timing (durações em milissegundos)."""
+        return ", ".join(f"{name};dur={duration:.2f}" for name, duration in self.spans.items())
+
+    def emit_metrics(self, function_name, **dimensions):
+        """Escreve as durações no log no formato Embedded Metric Format do CloudWatch."""
+        emit_emf(
+            {name: (round(duration, 3), "Milliseconds") for name, duration in self.spans.items()},
+            Function=function_name, **dimensions
+        )
+
+    def headers(self):
+        return {"Server-Timing": self.server_timing()}
+
+
+def emit_emf(metrics, **dimensions):
+    """Imprime um registro EMF; `metrics` mapeia nome -> (valor, unidade)."""
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in metrics.items()]
+            }]
+        },
+        **dimensions,
+        **{name: value for name, (value, _) in metrics.items()}
+    }
+    print(json.dumps(record))
+
+
+class ReportedCounters:
+    """Valores já publicados dos contadores cumulativos de um objeto, para publicar só a diferença.
+
+    Usa o lock do objeto dono (`lock`), o mesmo que protege os contadores.
+    """
+
+    def __init__(self, lock=None):
+        self._lock = lock or threading.Lock()
+        self._values = {}
+
+    def deltas(self, counters):
+        """Retorna {nome: diferença desde a última publicação} e registra os valores atuais."""
+        deltas = {}
+        with self._lock:
+            for name, value in counters.items():
+                previous = self._values.get(name, 0)
+                # Um instantâneo mais antigo que o último publicado não gera diferença negativa
+                self._values[name] = max(previous, value)
+                deltas[name] = self._values[name] - previous
+        return deltas
+
+
+def busy_response():
+    """Resposta 503 (formato do Lambda) para throttling da AWS esgotado após as novas tentativas."""
+    return {
+        "statusCode": 503,
+        "headers": {"Retry-After": str(RETRY_AFTER_SECONDS)},
+        "body": json.dumps({"message": BUSY_MESSAGE})
+    }
+
+
+def debug_sampled():
+    """Sorteia se a requisição atual deve registrar os payloads completos."""
+    return DEBUG_SAMPLE_RATE > 0 and random.random() < DEBUG_SAMPLE_RATE
+
+
+def debug_log(message, payload):
+    """Imprime o payload somente para a fração de requisições definida em DEBUG_SAMPLE_RATE."""
+    if debug_sampled():
+        print(message, payload)
@@ -0,0 +1,110 @@
+"""Aquecimento do container e verificação profunda das dependências.
+
+Cada dependência tem uma sonda barata que cria o cliente e abre conexões do pool
+(DNS + TLS). Uma resposta de erro do serviço à sonda (ex.: modelo inexistente no
+Bedrock) ainda conta como pronta: a conexão foi aberta e o serviço respondeu. Falhas
+de rede, timeouts e erros de permissão ou credencial (`NOT_READY_CODES`, as
+requisições reais falhariam do mesmo jeito) marcam a dependência como indisponível.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.aws_clients import limited_client
+
+# Conexões abertas por dependência no aquecimento (até BOTO_MAX_POOL_CONNECTIONS)
+WARMUP_CONNECTIONS = int(os.getenv('WARMUP_CONNECTIONS', 2))
+
+# Códigos de erro que indicam falta de permissão, credencial inválida ou recurso inexistente
+# ('403'/'404' são os códigos do HeadBucket, que não tem corpo de resposta)
+NOT_READY_CODES = {
+    'AccessDenied', 'AccessDeniedException', 'UnauthorizedOperation', 'UnrecognizedClientException',
+    'InvalidClientTokenId', 'InvalidAccessKeyId', 'SignatureDoesNotMatch', 'ExpiredToken',
+    'ExpiredTokenException', 'Forbidden', 'NoSuchBucket', '403', '404'
+}
+
+
+def is_warmup_event(event):
+    """Indica se a invocação é um ping de aquecimento (agendado ou do serverless-plugin-warmup)."""
+    if not isinstance(event, dict):
+        return False
+    return bool(event.get('warmup')) or event.get('source') in ('serverless-plugin-warmup', 'aws.events')
+
+
+def probe_s3(client):
+    client.head_bucket(Bucket=os.getenv('BUCKET_NAME'))
+
+
+def probe_rekognition(client):
+    client.list_collections(MaxResults=1)
+
+
+def probe_bedrock(client):
+    # O bedrock-runtime não tem operação de leitura barata: um modelo inexistente é
+    # recusado pelo serviço sem custo, depois de abrir a conexão
+    client.invoke_model(modelId='warmup', body=b'{}')
+
+
+# Cada sonda usa o mesmo cliente (e pool de conexões) das chamadas da requisição: S3 e
+# Rekognition passam pelo limitador, logo usam limited_client. Serviços com configuração
+# própria (ex.: o bedrock-runtime com read_timeout do hedge) passam a sonda em `probes`
+PROBES = {
+    's3': lambda: probe_s3(limited_client('s3')),
+    'rekognition': lambda: probe_rekognition(limited_client('rekognition')),
+    'bedrock': lambda: probe_bedrock(limited_client('bedrock-runtime'))
+}
+
+
+def _run_probe(probe):
+    inicio = time.perf_counter()
+    try:
+        probe()
+        ready, detail = True, "ok"
+    except Exception as e:
+        code = (getattr(e, 'response', None) or {}).get('Error', {}).get('Code')
+        ready, detail = (code not in NOT_READY_CODES, code) if code else (False, str(e))
+    return {"ready": ready, "ms": round((time.perf_counter() - inicio) * 1000, 2), "detail": detail}
+
+
+def check_dependencies(names, connections=None, probes=None):
+    """Executa as sondas em paralelo (`connections` chamadas por dependência) e mede cada uma.
+
+    `probes` substitui sondas de PROBES ({dependência: função sem argumentos}).
+    Retorna {dependência: {"ready", "ms", "detail"}} com o resultado da chamada mais lenta.
+    """
+    connections = connections or WARMUP_CONNECTIONS
+    probes = dict(PROBES, **(probes or {}))
+    with ThreadPoolExecutor(max_workers=max(1, len(names) * connections)) as executor:
+        futures = {name: [executor.submit(_run_probe, probes[name]) for _ in range(connections)] for name in names}
+        report = {}
+        for name, probe_futures in futures.items():
+            results = [future.result() for future in probe_futures]
+            report[name] = max(results, key=lambda result: (not result["ready"], result["ms"]))
+    return report
+
+
+def timed(func, *args, **kwargs):
+    """Executa uma etapa local do aquecimento (ex.: pré-carga de cache) no formato do relatório."""
+    inicio = time.perf_counter()
+    try:
+        detail = func(*args, **kwargs)
+        ready = True
+    except Exception as e:
+        ready, detail = False, str(e)
+    return {"ready": ready, "ms": round((time.perf_counter() - inicio) * 1000, 2), "detail": detail}
+
+
+def summarize(report, started_at):
+    """Monta a resposta do aquecimento/health check a partir do relatório das dependências."""
+    ready = all(item["ready"] for item in report.values())
+    return {
+        "status": "ok" if ready else "degraded",
+        "dependencies": report,
+        "total_ms": round((time.perf_counter() - started_at) * 1000, 2)
+    }
+
+
+def warmup_on_init():
+    """Aquecer já na inicialização em concorrência provisionada ou com WARMUP_ON_INIT=true."""
+    return os.getenv('WARMUP_ON_INIT', 'false').lower() == 'true' or \
+        os.getenv('AWS_LAMBDA_INITIALIZATION_TYPE') == 'provisioned-concurrency'